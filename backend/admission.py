@@ -0,0 +1,198 @@
+# backend/admission.py
+# Admission control for /ws/chat: a process-wide generation budget with a bounded wait queue,
+# and per-client token buckets for connections and prompts.
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import NamedTuple
+
+from fastapi import WebSocket
+
+from app_logging import get_logger
+from chat_metrics import ADMISSION_REJECTIONS, STAGE_SECONDS
+
+# --- Configuration ---
+MAX_GENERATIONS_PER_PROCESS = int(os.getenv("MAX_GENERATIONS_PER_PROCESS", "64"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "128"))  # Prompts that may wait for a generation slot
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))  # Seconds a prompt may wait before it is rejected
+ADMISSION_STATUS_INTERVAL = float(os.getenv("ADMISSION_STATUS_INTERVAL", "1"))  # Seconds between queue position updates
+MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "2000"))  # Open WebSockets per process
+# Per client (IP, or CLIENT_ID_HEADER behind a proxy): sustained rate per second and burst; 0 disables.
+# Off by default: behind a reverse proxy without CLIENT_ID_HEADER every user would share one bucket.
+CLIENT_PROMPT_RATE = float(os.getenv("CLIENT_PROMPT_RATE", "0"))
+CLIENT_PROMPT_BURST = int(os.getenv("CLIENT_PROMPT_BURST", "10"))
+CLIENT_CONNECT_RATE = float(os.getenv("CLIENT_CONNECT_RATE", "0"))
+CLIENT_CONNECT_BURST = int(os.getenv("CLIENT_CONNECT_BURST", "10"))
+# e.g. x-forwarded-for; its first value identifies the client. Clients can send this header themselves,
+# so only set it when the proxy in front overwrites it (rather than appending to it).
+CLIENT_ID_HEADER = os.getenv("CLIENT_ID_HEADER", "").lower()
+CLIENT_BUCKETS_MAX = 10000  # Clients tracked at once; the least recently seen are forgotten (and start full again)
+
+log = get_logger("admission")
+
+
+class Rejection(NamedTuple):
+    """Why a connection or prompt was turned away, and when trying again makes sense."""
+    message: str
+    retry_after: float  # Seconds
+
+    @property
+    def details(self) -> dict:
+        return {"retry_after": self.retry_after}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Spend one token; returns 0, or the seconds until one is available (nothing spent)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientLimiter:
+    """One token bucket per client key, bounded LRU."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = CLIENT_BUCKETS_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def take(self, client: str) -> float:
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take()
+
+
+def client_key(websocket: WebSocket) -> str:
+    if CLIENT_ID_HEADER:
+        forwarded = websocket.headers.get(CLIENT_ID_HEADER)
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return websocket.client.host if websocket.client else "unknown"
+
+
+class AdmissionController:
+    """Decides whether a connection or prompt may start, and queues prompts fairly when busy.
+
+    At most `max_in_flight` generations run at once. Further prompts wait in a FIFO of at
+    most `queue_size`, hearing their position every `status_interval` seconds; a prompt is
+    rejected at once, with a retry_after estimate, when the queue is full, and after
+    `queue_timeout` seconds of waiting. Work beyond capacity is turned away instead of
+    making every prompt in flight slower.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_GENERATIONS_PER_PROCESS, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, status_interval: float = ADMISSION_STATUS_INTERVAL,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.status_interval = status_interval
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.connections = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._average_seconds = 5.0  # Moving average of generation time, for retry_after estimates
+        self.prompt_limits = ClientLimiter(CLIENT_PROMPT_RATE, CLIENT_PROMPT_BURST)
+        self.connect_limits = ClientLimiter(CLIENT_CONNECT_RATE, CLIENT_CONNECT_BURST)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _reject(self, reason: str, message: str, retry_after: float) -> Rejection:
+        ADMISSION_REJECTIONS.inc(reason)
+        log.debug("Rejected (%s): %s", reason, message)
+        return Rejection(message, max(1, math.ceil(retry_after)))
+
+    def _queue_wait_estimate(self, position: int) -> float:
+        return self._average_seconds * (position // self.max_in_flight + 1)
+
+    def open_connection(self, client: str) -> Rejection | None:
+        wait = self.connect_limits.take(client)
+        if wait:
+            return self._reject("client_connections", "Reconnecting too often; slow down.", wait)
+        if self.connections >= self.max_connections:
+            return self._reject("connections", "Server is at its connection limit; try again shortly.", self._average_seconds)
+        self.connections += 1
+        return None
+
+    def close_connection(self):
+        self.connections -= 1
+
+    def check_prompt(self, client: str) -> Rejection | None:
+        """Per-client rate limit, and a fast rejection if the queue is already full."""
+        wait = self.prompt_limits.take(client)
+        if wait:
+            return self._reject("client_prompts", "Too many prompts; slow down.", wait)
+        if self.in_flight >= self.max_in_flight and len(self._waiters) >= self.queue_size:
+            return self._reject("queue_full", "Server is busy; try again shortly.", self._queue_wait_estimate(len(self._waiters)))
+        return None
+
+    async def acquire(self, on_queued=None) -> Rejection | None:
+        """Take a generation slot, waiting in the queue if needed; `on_queued(position, queued)` is
+        awaited with 1-based positions while waiting. Returns a Rejection instead of a slot."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return self._reject("queue_full", "Server is busy; try again shortly.", self._queue_wait_estimate(len(self._waiters)))
+        granted = asyncio.get_running_loop().create_future()
+        self._waiters.append(granted)
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.queue_timeout
+        last_position = None
+        try:
+            while not granted.done():
+                position = self._waiters.index(granted) + 1
+                if position != last_position and on_queued is not None:
+                    last_position = position
+                    await on_queued(position, len(self._waiters))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._reject("queue_timeout", "Server is busy; waited too long for a free slot.",
+                                        self._queue_wait_estimate(position))
+                await asyncio.wait([granted], timeout=min(self.status_interval, remaining))
+        except BaseException:
+            if granted.done():
+                self.release()  # Handed a slot just as this prompt was cancelled: pass it on
+            raise
+        finally:
+            if not granted.done():
+                granted.cancel()
+                self._waiters.remove(granted)
+        STAGE_SECONDS.observe(time.perf_counter() - started, "queue")
+        return None
+
+    def release(self, seconds: float | None = None):
+        if seconds is not None:
+            self._average_seconds += 0.1 * (seconds - self._average_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)  # The slot passes straight to the next prompt in line
+                return
+        self.in_flight -= 1
+
+
+admission = AdmissionController()
@@ -0,0 +1,191 @@
+# backend/app_logging.py
+# Non-blocking, sampled, structured logging for the backend and the MCP server (standard library only).
+#
+# Callers only enqueue records; a QueueListener thread formats and writes them, so the
+# event-loop thread never blocks on stdout/stderr. Components are child loggers of
+# "calculon" (e.g. "calculon.chat", "calculon.server.tools") and can be given their own
+# level and sample rate.
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+from metrics import Counter
+
+# --- Configuration ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # Per component, e.g. "chat=DEBUG,server.tools=WARNING"
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")  # Fraction of DEBUG/INFO records kept, e.g. "server.tools=0.01"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "calculon"
+
+LOG_RECORDS_DROPPED = Counter("calculon_log_records_dropped_total",
+                              "Log records dropped because the log queue was full or sampled out.",
+                              labelnames=("reason",))
+
+# Attributes every LogRecord has; anything else on a record came from extra= and is a structured field.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# name -> zero-argument callable, read in prepare() on the calling thread before the record is queued,
+# which is why contextvars such as the request id resolve to the caller's values
+_context: dict = {}
+
+
+def get_logger(component: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{component}")
+
+
+def add_log_context(name: str, getter):
+    """Attach getter()'s value (when not None) to every record, e.g. a request ID from a ContextVar."""
+    _context[name] = getter
+
+
+def _parse_settings(spec: str) -> dict[str, str]:
+    settings = {}
+    for item in spec.split(","):
+        component, sep, value = item.partition("=")
+        if sep and component.strip():
+            settings[f"{ROOT_LOGGER}.{component.strip()}"] = value.strip()
+    return settings
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of DEBUG/INFO records per component; warnings and errors are never sampled."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        LOG_RECORDS_DROPPED.inc("sampled")
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues without waiting; when the queue is full the record is dropped and counted."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Do only the work that must happen in the caller's thread: resolve %-args and
+        # tracebacks (they may change or go away) and capture context values.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for name, getter in _context.items():
+            if not hasattr(record, name):
+                value = getter()
+                if value is not None:
+                    setattr(record, name, value)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc("queue_full")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def formatTime(self, record, datefmt=None):
+        return time.strftime("%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            extra = " ".join(f"{k}={v}" for k, v in fields.items())
+            line, sep, tail = line.partition("\n")  # Keep tracebacks after the fields
+            line = f"{line} [{extra}]{sep}{tail}"
+        return line
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def configure_logging(stream=None) -> logging.Logger:
+    """Route every "calculon.*" logger through the queue; safe to call more than once."""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    if _listener is not None:
+        return root
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    rates = {}
+    for name, value in _parse_settings(LOG_SAMPLE).items():
+        try:
+            rates[name] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            pass
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(handler)
+    root.propagate = False
+    for name, level in _parse_settings(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return root
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,155 @@
+# backend/arithmetic_fast_path.py
+import ast
+import functools
+import os
+import re
+import time
+
+from fastapi import WebSocket
+
+from ws_writer import send_websocket_message
+from conversation import ConversationState
+from chat_metrics import PROMPTS_TOTAL, STAGE_SECONDS, TOOL_CALLS_PER_PROMPT
+
+# --- Configuration ---
+ARITHMETIC_FAST_PATH = os.getenv("ARITHMETIC_FAST_PATH", "0") == "1"  # Opt-in: plain expressions skip the model and the MCP server
+MAX_EXPRESSION_LENGTH = 256
+MAX_OPERATIONS = 64
+
+# Optional wording around a bare expression, e.g. "What is 12*(3+4)/7?" or "calculate 2+2 ="
+_PROMPT_RE = re.compile(
+    r"^\s*(?:(?:what\s+is|what's|calculate|compute|evaluate)\s*:?\s*)?"
+    r"(?P<expr>[\d\s.+\-*/()×÷]+?)\s*=?\s*\??\s*$",
+    re.IGNORECASE,
+)
+
+# Same tool names and argument names as mcp/calculater_mcp.py, so the UI renders identical steps.
+_BIN_OPS = {
+    ast.Add: ("add", "a", "b"),
+    ast.Sub: ("subtract", "a", "b"),
+    ast.Mult: ("multiply", "a", "b"),
+    ast.Div: ("divide", "numerator", "denominator"),
+}
+
+DIVIDE_BY_ZERO_RESULT = "Error: Cannot divide by zero."
+
+
+class NotPlainArithmetic(ValueError):
+    pass
+
+
+def extract_expression(prompt: str) -> str | None:
+    if len(prompt) > MAX_EXPRESSION_LENGTH:
+        return None
+    match = _PROMPT_RE.match(prompt)
+    if not match:
+        return None
+    expression = match.group("expr").strip().replace("×", "*").replace("÷", "/")
+    if not any(op in expression.lstrip("+-") for op in "+-*/"):
+        return None  # A lone number is a question for Calculon, not a calculation.
+    return expression
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> tuple:
+    """Parse an expression into a tuple of (tool, arg_names, left, right) steps in BODMAS order.
+
+    Operands are floats or ("step", index) references to earlier results. Raises
+    NotPlainArithmetic for anything other than numbers, + - * /, unary signs and brackets.
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise NotPlainArithmetic(str(e)) from e
+    steps = []
+
+    def visit(node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return float(node.value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            operand = visit(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if isinstance(operand, tuple):
+                # Negating an intermediate result is itself a tool step: 0 - x.
+                steps.append(("subtract", ("a", "b"), 0.0, operand))
+                return ("step", len(steps) - 1)
+            return -operand
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+            left = visit(node.left)
+            right = visit(node.right)
+            tool_name, left_name, right_name = _BIN_OPS[type(node.op)]
+            steps.append((tool_name, (left_name, right_name), left, right))
+            if len(steps) > MAX_OPERATIONS:
+                raise NotPlainArithmetic("Expression has too many operations.")
+            return ("step", len(steps) - 1)
+        raise NotPlainArithmetic(f"Unsupported syntax: {type(node).__name__}")
+
+    visit(tree.body)
+    if not steps:
+        raise NotPlainArithmetic("Expression contains no operations.")
+    return tuple(steps)
+
+
+def format_number(value: float) -> str:
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def run_steps(steps: tuple):
+    """Yield (tool_name, args, result) for each step; result is DIVIDE_BY_ZERO_RESULT on x/0 and stops."""
+    results = []
+    for tool_name, (left_name, right_name), left, right in steps:
+        a = results[left[1]] if isinstance(left, tuple) else left
+        b = results[right[1]] if isinstance(right, tuple) else right
+        args = {left_name: a, right_name: b}
+        if tool_name == "add":
+            result = a + b
+        elif tool_name == "subtract":
+            result = a - b
+        elif tool_name == "multiply":
+            result = a * b
+        elif b == 0:
+            yield tool_name, args, DIVIDE_BY_ZERO_RESULT
+            return
+        else:
+            result = a / b
+        results.append(result)
+        yield tool_name, args, result
+
+
+async def answer_plain_arithmetic(user_prompt: str, websocket: WebSocket, conversation: ConversationState | None = None) -> bool:
+    """Answer a pure arithmetic prompt in-process; return False to fall through to the model."""
+    expression = extract_expression(user_prompt)
+    if expression is None:
+        return False
+    try:
+        steps = compile_expression(expression)
+    except NotPlainArithmetic:
+        return False
+
+    started = time.perf_counter()
+    result = None
+    for index, (tool_name, args, result) in enumerate(run_steps(steps)):
+        # Same ids and response shape as the model path, where the MCP server returns text content.
+        call_id = f"call-0-{index}"
+        await send_websocket_message(websocket, "tool_call", {"id": call_id, "name": tool_name, "args": args})
+        response = {"result": {"content": [{"type": "text", "text": str(result)}], "isError": False}}
+        await send_websocket_message(websocket, "tool_response", {"id": call_id, "name": tool_name, "response": response})
+
+    # The UI treats '*' as Markdown emphasis, so show the expression with × and ÷.
+    shown = expression.replace("*", "×").replace("/", "÷")
+    if result == DIVIDE_BY_ZERO_RESULT:
+        answer = f"*Sigh.* {shown} asks me to divide by zero. No."
+    else:
+        answer = f"*Sigh.* {shown} = **{format_number(result)}**"
+    await send_websocket_message(websocket, "text_chunk", answer)
+    if conversation is not None:
+        # Keep the answer in the history so follow-ups like "now divide that by 3" can use it.
+        conversation.record_turn(user_prompt, answer)
+    await send_websocket_message(websocket, "stream_end", "Calculation complete.")
+    STAGE_SECONDS.observe(time.perf_counter() - started, "fast_path")
+    TOOL_CALLS_PER_PROMPT.observe(len(steps))
+    PROMPTS_TOTAL.inc("fast_path", "ok")
+    return True
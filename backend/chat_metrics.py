@@ -0,0 +1,42 @@
+# backend/chat_metrics.py
+# Metrics for each stage of the chat pipeline, exposed on GET /metrics.
+from metrics import COUNT_BUCKETS, RATE_BUCKETS, Counter, Histogram
+
+STAGE_SECONDS = Histogram(
+    "calculon_stage_seconds",
+    "Time spent in each stage of a prompt (queue, mcp_acquire, list_tools, gemini_connect, gemini_stream, tools, fast_path, total, cache_replay).",
+    labelnames=("stage",),
+)
+TTFT_SECONDS = Histogram(
+    "calculon_time_to_first_token_seconds",
+    "Time from receiving a prompt to the first thought or text chunk from the model.",
+)
+TOKENS_PER_SECOND = Histogram(
+    "calculon_output_tokens_per_second",
+    "Model output tokens per second of streaming, per prompt.",
+    buckets=RATE_BUCKETS,
+)
+TOOL_SECONDS = Histogram(
+    "calculon_tool_call_seconds",
+    "MCP tool call latency as seen by the backend.",
+    labelnames=("tool", "cached"),
+)
+TOOL_CALLS_PER_PROMPT = Histogram(
+    "calculon_tool_calls_per_prompt",
+    "Number of tool calls the model made for one prompt.",
+    buckets=COUNT_BUCKETS,
+)
+WS_SEND_SECONDS = Histogram(
+    "calculon_websocket_send_seconds",
+    "Time to write one frame to a WebSocket client.",
+)
+PROMPTS_TOTAL = Counter(
+    "calculon_prompts_total",
+    "Prompts handled, by path (model, fast_path or cache) and outcome.",
+    labelnames=("path", "outcome"),
+)
+ADMISSION_REJECTIONS = Counter(
+    "calculon_admission_rejections_total",
+    "Connections and prompts turned away, by reason (client_connections, connections, client_prompts, queue_full, queue_timeout).",
+    labelnames=("reason",),
+)
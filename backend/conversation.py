@@ -0,0 +1,151 @@
+# backend/conversation.py
+import asyncio
+import collections
+import itertools
+import os
+import time
+
+from app_logging import get_logger
+
+# --- Configuration ---
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "20"))
+CONVERSATION_MAX_PROMPT_TOKENS = int(os.getenv("CONVERSATION_MAX_PROMPT_TOKENS", "8000"))
+CONVERSATION_IDLE_TIMEOUT = float(os.getenv("CONVERSATION_IDLE_TIMEOUT", "1800"))
+CONVERSATION_SUMMARY_TURNS = int(os.getenv("CONVERSATION_SUMMARY_TURNS", "5"))
+SUMMARY_ANSWER_CHARS = 200
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+log = get_logger("conversation")
+
+
+class Turn:
+    __slots__ = ("user_text", "model_text", "chars")
+
+    def __init__(self, user_text: str, model_text: str):
+        self.user_text = user_text
+        self.model_text = model_text
+        self.chars = len(user_text) + len(model_text)
+
+
+class ConversationState:
+    """Bounded history for one WebSocket connection.
+
+    Old turns are dropped once the history exceeds CONVERSATION_MAX_TURNS or would push
+    the next request over CONVERSATION_MAX_PROMPT_TOKENS. Token sizes are estimated from
+    the prompt_token_count Gemini reported for the previous request, and each dropped
+    turn leaves a one-line summary behind so earlier results can still be referenced.
+    """
+
+    def __init__(self, max_turns: int = CONVERSATION_MAX_TURNS,
+                 max_prompt_tokens: int = CONVERSATION_MAX_PROMPT_TOKENS,
+                 summary_turns: int = CONVERSATION_SUMMARY_TURNS):
+        self.max_turns = max_turns
+        self.max_prompt_tokens = max_prompt_tokens
+        self.turns: collections.deque[Turn] = collections.deque()
+        self.summaries: collections.deque[str] = collections.deque(maxlen=summary_turns)
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+        self.overhead_tokens = 0  # System instruction + tool declarations, learned from usage.
+        self.last_active = time.monotonic()
+
+    def contents_for(self, user_prompt: str) -> list:
+        from google.genai import types as genai_types  # Deferred: main.py imports this module before the port opens
+        self.last_active = time.monotonic()
+        contents = []
+        if self.summaries:
+            summary = "Summary of earlier results in this conversation:\n" + "\n".join(self.summaries)
+            contents.append(genai_types.Content(role="user", parts=[genai_types.Part(text=summary)]))
+            contents.append(genai_types.Content(role="model", parts=[genai_types.Part(text="Noted.")]))
+        for turn in self.turns:
+            contents.append(genai_types.Content(role="user", parts=[genai_types.Part(text=turn.user_text)]))
+            contents.append(genai_types.Content(role="model", parts=[genai_types.Part(text=turn.model_text)]))
+        contents.append(genai_types.Content(role="user", parts=[genai_types.Part(text=user_prompt)]))
+        return contents
+
+    def record_turn(self, user_prompt: str, model_text: str, prompt_token_count: int | None = None):
+        self.last_active = time.monotonic()
+        if not model_text:
+            return
+        if prompt_token_count:
+            self._calibrate(user_prompt, prompt_token_count)
+        self.turns.append(Turn(user_prompt, model_text))
+        self._trim()
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self.turns or self.summaries)
+
+    def clear(self):
+        self.turns.clear()
+        self.summaries.clear()
+
+    def estimated_tokens(self) -> int:
+        chars = sum(t.chars for t in self.turns) + sum(len(s) for s in self.summaries)
+        return self.overhead_tokens + int(chars / self.chars_per_token)
+
+    def _calibrate(self, user_prompt: str, prompt_token_count: int):
+        # prompt_token_count covered the fixed overhead plus history plus this prompt.
+        chars = sum(t.chars for t in self.turns) + sum(len(s) for s in self.summaries) + len(user_prompt)
+        if not self.turns and not self.summaries:
+            self.overhead_tokens = max(0, prompt_token_count - int(chars / self.chars_per_token))
+            return
+        history_tokens = prompt_token_count - self.overhead_tokens
+        if history_tokens > 0 and chars > 0:
+            self.chars_per_token = max(1.0, chars / history_tokens)
+
+    def _trim(self):
+        while self.turns and (len(self.turns) > self.max_turns or self.estimated_tokens() > self.max_prompt_tokens):
+            dropped = self.turns.popleft()
+            answer = " ".join(dropped.model_text.split())
+            if len(answer) > SUMMARY_ANSWER_CHARS:
+                answer = answer[:SUMMARY_ANSWER_CHARS] + "..."
+            self.summaries.append(f"- Q: {dropped.user_text[:SUMMARY_ANSWER_CHARS]} A: {answer}")
+
+
+class ConversationRegistry:
+    """Tracks every open connection's conversation so idle histories can be released."""
+
+    def __init__(self, idle_timeout: float = CONVERSATION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._conversations: dict[int, ConversationState] = {}
+        self._ids = itertools.count()
+        self._sweeper: asyncio.Task | None = None
+
+    def open(self) -> tuple[int, ConversationState]:
+        conversation_id = next(self._ids)
+        conversation = ConversationState()
+        self._conversations[conversation_id] = conversation
+        return conversation_id, conversation
+
+    def close(self, conversation_id: int):
+        self._conversations.pop(conversation_id, None)
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        evicted = 0
+        for conversation in self._conversations.values():
+            if conversation.turns and now - conversation.last_active >= self.idle_timeout:
+                conversation.clear()
+                evicted += 1
+        return evicted
+
+    def start(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="conversation-sweeper")
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            evicted = self.evict_idle()
+            if evicted:
+                log.info("Cleared %d idle conversation histories.", evicted)
+
+
+conversations = ConversationRegistry()
@@ -0,0 +1,108 @@
+# backend/generation_tasks.py
+import asyncio
+import itertools
+import os
+import time
+
+from fastapi import WebSocket
+
+from ws_writer import current_request_id, send_websocket_message
+from admission import admission
+from app_logging import get_logger
+
+# --- Configuration ---
+MAX_GENERATIONS_PER_CONNECTION = int(os.getenv("MAX_GENERATIONS_PER_CONNECTION", "2"))
+
+# Every in-flight generation in this process, so a draining worker can wait for them.
+_all_generations: set[asyncio.Task] = set()
+
+log = get_logger("generation")
+
+
+class ConnectionTasks:
+    """In-flight generations of one WebSocket connection, each an asyncio task with a request ID.
+
+    The receive loop stays free to read cancels, pings and new prompts while
+    generations run; closing the connection cancels every task, which also closes
+    the upstream Gemini stream. Each generation first takes a process-wide slot from
+    the admission controller, queueing (with position updates) or being rejected.
+    """
+
+    def __init__(self, websocket: WebSocket, max_in_flight: int = MAX_GENERATIONS_PER_CONNECTION):
+        self.websocket = websocket
+        self.max_in_flight = max_in_flight
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._ids = itertools.count(1)
+        self._closed = False
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def new_request_id(self) -> str:
+        return f"req-{next(self._ids)}"
+
+    def start(self, request_id: str, run) -> str | None:
+        """Run `await run()` as a task; returns an error message instead if it cannot start."""
+        if self._closed:
+            return "Connection is closing."
+        if request_id in self._tasks:
+            return f"Request {request_id} is already in progress."
+        if len(self._tasks) >= self.max_in_flight:
+            return f"Too many requests in progress on this connection (limit {self.max_in_flight}). Cancel one or wait."
+        task = asyncio.create_task(self._run(request_id, run), name=f"generation:{request_id}")
+        self._tasks[request_id] = task
+        _all_generations.add(task)
+        task.add_done_callback(lambda _t: self._tasks.pop(request_id, None))
+        task.add_done_callback(_all_generations.discard)
+        return None
+
+    def cancel(self, request_id: str) -> bool:
+        task = self._tasks.get(request_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def wait_idle(self):
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def cancel_all(self):
+        self._closed = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, request_id: str, run):
+        current_request_id.set(request_id)
+        try:
+            rejection = await admission.acquire(self._report_queue_position)
+            if rejection is not None:
+                if not self._closed:
+                    await send_websocket_message(self.websocket, "error", rejection.message, details=rejection.details)
+                return
+            started = time.perf_counter()
+            try:
+                await run()
+            finally:
+                admission.release(time.perf_counter() - started)
+        except asyncio.CancelledError:
+            if not self._closed:
+                await send_websocket_message(self.websocket, "stream_end", "Request cancelled.")
+            raise
+        except Exception as e:
+            log.exception("Unhandled error in generation %s: %s", request_id, e)
+            if not self._closed:
+                await send_websocket_message(self.websocket, "error", f"Server error: {str(e)}")
+
+    async def _report_queue_position(self, position: int, queued: int):
+        if not self._closed:
+            await send_websocket_message(self.websocket, "status", f"Server busy: you are number {position} of {queued} in the queue.",
+                                         details={"queue_position": position, "queue_length": queued})
+
+
+async def wait_for_generations():
+    """Return once no generation is running in this process."""
+    while _all_generations:
+        await asyncio.gather(*_all_generations, return_exceptions=True)
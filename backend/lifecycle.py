@@ -0,0 +1,89 @@
+# backend/lifecycle.py
+# Readiness/liveness state and SIGTERM draining (standard library only, shared with the MCP server).
+import asyncio
+import os
+import signal
+import threading
+import time
+
+from app_logging import get_logger
+
+# --- Configuration ---
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "30"))  # Seconds in-flight work may take to finish after SIGTERM
+
+log = get_logger("lifecycle")
+
+
+class Lifecycle:
+    """Tracks whether this worker should receive traffic, and drains it on SIGTERM/SIGINT.
+
+    uvicorn closes WebSockets (code 1012) as soon as its own signal handler runs, so
+    install_signal_handlers() puts ours in front: it marks the worker not ready, waits
+    up to `drain_timeout` for `wait_drained()` and only then hands the signal on to
+    uvicorn. A second signal skips the wait.
+    """
+
+    def __init__(self, drain_timeout: float = DRAIN_TIMEOUT):
+        self.drain_timeout = drain_timeout
+        self.started_at = time.time()
+        self.ready = False
+        self.draining = False
+        self._drained: asyncio.Event | None = None
+
+    def mark_ready(self):
+        self.ready = True
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready and not self.draining,
+            "draining": self.draining,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 1),
+        }
+
+    async def wait_for_drain(self):
+        """Return once a drain has started."""
+        if self._drained is None:
+            self._drained = asyncio.Event()
+        if self.draining:
+            return
+        await self._drained.wait()
+
+    def install_signal_handlers(self, wait_drained=None):
+        """Chain in front of the current SIGTERM/SIGINT handlers; call from the event loop's thread."""
+        if self._drained is None:
+            self._drained = asyncio.Event()
+        if threading.current_thread() is not threading.main_thread():
+            return  # Signals can only be handled in the main thread (e.g. not under a test client).
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue  # Not running under a server that handles this signal; leave the default.
+            signal.signal(sig, lambda signum, frame, previous=previous:
+                          self._on_signal(loop, previous, wait_drained, signum, frame))
+
+    def _on_signal(self, loop, previous, wait_drained, signum, frame):
+        if self.draining or wait_drained is None:
+            self.draining = True
+            previous(signum, frame)
+            return
+        self.draining = True
+        loop.call_soon_threadsafe(self._start_drain, previous, wait_drained, signum)
+
+    def _start_drain(self, previous, wait_drained, signum):
+        self._drained.set()
+        asyncio.create_task(self._drain(previous, wait_drained, signum), name="drain")
+
+    async def _drain(self, previous, wait_drained, signum):
+        log.info("Draining: waiting up to %.0fs for in-flight work.", self.drain_timeout)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(wait_drained(), timeout=self.drain_timeout)
+            log.info("Drained in %.2fs.", time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            log.warning("Drain timeout reached; shutting down with work still in flight.")
+        previous(signum, None)
+
+
+lifecycle = Lifecycle()
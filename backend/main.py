@@ -1,53 +1,189 @@
 # backend/main.py
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse # Or FileResponse
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 import uvicorn
 import os
 import sys
 import json
+import asyncio
+import functools
+from contextlib import asynccontextmanager
 
 # Add backend directory to sys.path to import mcp_client_logic
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from mcp_client_logic import process_user_message_stream # We'll create this next
+from app_logging import configure_logging, get_logger
+configure_logging()
+# google.genai and the MCP client are imported after the port opens; see startup.py
+from startup import chat_stack, loaded, shut_down, warm_up
+from tool_result_cache import tool_result_cache
+from response_cache import response_cache
+from arithmetic_fast_path import ARITHMETIC_FAST_PATH, answer_plain_arithmetic
+from conversation import conversations
+from generation_tasks import ConnectionTasks, wait_for_generations
+from admission import admission, client_key
+from lifecycle import lifecycle
+from ws_writer import attach_outbox, send_websocket_message
+from metrics import PROMETHEUS_CONTENT_TYPE, Gauge, render_metrics
+from static_assets import STATIC_MAX_AGE, static_assets
 
-app = FastAPI()
+log = get_logger("ws")
 
-# Mount static files (HTML, CSS, JS for frontend)
-# Ensure this path is correct relative to where you run uvicorn
-# If running uvicorn from chat_ui_project/, then 'static' is correct
-app.mount("/static", StaticFiles(directory="../static"), name="static")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    conversations.start()
+    # Page assets are served from memory, precompressed
+    static_assets.load()
+    # On SIGTERM: stop taking prompts, let in-flight ones finish, then let uvicorn shut down
+    lifecycle.install_signal_handlers(wait_for_generations)
+    # Liveness is answered from here on; the Gemini client and MCP session pool start (and
+    # optionally open their connections) in the background, and readiness follows
+    warm = asyncio.create_task(warm_up(), name="startup-warm-up")
+    yield
+    warm.cancel()
+    await conversations.stop()
+    await shut_down()
+    response_cache.close()
 
-@app.get("/", response_class=HTMLResponse)
-async def get_chat_page():
-    # Serve the main HTML page
-    # For simplicity, reading it here. For complex apps, use FileResponse or templating.
-    try:
-        with open("../static/index.html", "r") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Chat UI - index.html not found</h1><p>Make sure static/index.html exists.</p>", status_code=404)
+app = FastAPI(lifespan=lifespan)
+
+def mcp_pool_stat(key: str) -> int:
+    # Zero until the chat stack is imported; a scrape must not import it
+    chat = loaded("mcp_client_logic")
+    return chat.get_mcp_pool(chat.MCP_SERVER_URL).stats[key] if chat is not None else 0
+
+Gauge("calculon_mcp_pool_connections", "Open MCP sessions in the pool, idle or in use.", lambda: mcp_pool_stat("size"))
+Gauge("calculon_mcp_pool_idle_connections", "Idle MCP sessions in the pool.", lambda: mcp_pool_stat("idle"))
+Gauge("calculon_open_conversations", "Open WebSocket conversations.", lambda: len(conversations))
+Gauge("calculon_generations_in_flight", "Generations holding an admission slot.", lambda: admission.in_flight)
+Gauge("calculon_generations_queued", "Prompts waiting for an admission slot.", lambda: admission.queued)
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def get_static_asset(path: str, request: Request):
+    # Frontend CSS/JS from memory; browsers reuse them for STATIC_MAX_AGE, then revalidate by ETag
+    response = static_assets.response(request, path, f"public, max-age={STATIC_MAX_AGE}")
+    return response or Response("Not Found", status_code=404, media_type="text/plain")
+
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+async def get_chat_page(request: Request):
+    # The main HTML page, revalidated on every load (a 304 when unchanged)
+    response = static_assets.response(request, "index.html", "no-cache")
+    return response or HTMLResponse(content="<h1>Chat UI - index.html not found</h1><p>Make sure static/index.html exists.</p>", status_code=404)
+
+@app.post("/tools/reload")
+async def reload_tools():
+    # Drop cached MCP tool lists; the next prompt refetches them from the server
+    catalogue = loaded("tool_catalogue")
+    invalidated = await catalogue.tool_catalogue.invalidate() if catalogue is not None else []
+    return {"invalidated": invalidated}
+
+@app.get("/tools/cache-stats")
+async def tool_cache_stats():
+    # The caches may count rows in SQLite or ask the store manager; keep that off the event loop like their get/put
+    return {"client_results": await asyncio.to_thread(tool_result_cache.stats),
+            "responses": await asyncio.to_thread(response_cache.stats)}
+
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the event loop is responsive
+    return lifecycle.status()
+
+@app.get("/readyz")
+async def readyz():
+    # Readiness: warmed up and not draining
+    status = lifecycle.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text format: per-stage latency, TTFT, tokens/sec, tool latency, WebSocket send latency
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.websocket("/ws/chat")
 async def websocket_chat_endpoint(websocket: WebSocket):
     await websocket.accept()
-    print("WebSocket connection accepted.")
+    # Reconnect storms and connection floods are turned away before any per-connection state exists
+    client = client_key(websocket)
+    rejection = admission.open_connection(client)
+    if rejection:
+        await send_websocket_message(websocket, "error", rejection.message, details=rejection.details)
+        await websocket.close(code=1013)  # Try again later
+        return
+    log.info("WebSocket connection accepted.")
+    # All sends go through one bounded, coalescing outbound queue
+    outbox = attach_outbox(websocket)
+    # Per-connection history so follow-up questions can build on earlier answers
+    conversation_id, conversation = conversations.open()
+    # Generations run as tasks so this loop can keep reading cancels, pings and new prompts
+    tasks = ConnectionTasks(websocket)
+
+    async def answer(user_prompt):
+        # Plain expressions like "12*(3+4)/7" are answered in-process without the model
+        if ARITHMETIC_FAST_PATH and await answer_plain_arithmetic(user_prompt, websocket, conversation):
+            return
+        # This function will handle connecting to MCP, Gemini, and streaming back
+        chat = await chat_stack()  # Waits for the startup import without blocking the event loop
+        await chat.process_user_message_stream(user_prompt, websocket, conversation)
+
+    async def close_when_drained():
+        # Once this worker drains, finish the prompts in flight and send the client elsewhere
+        await lifecycle.wait_for_drain()
+        await tasks.wait_idle()
+        await send_websocket_message(websocket, "status", "Server is restarting; reconnect to continue.")
+        await outbox.close()
+        await websocket.close(code=1012)  # Service restart
+
+    drain_watch = asyncio.create_task(close_when_drained())
+
     try:
         while True:
             user_message_json = await websocket.receive_text()
-            user_message_data = json.loads(user_message_json)
-            user_prompt = user_message_data.get("message")
+            try:
+                user_message_data = json.loads(user_message_json)
+            except json.JSONDecodeError as e:
+                await send_websocket_message(websocket, "error", f"Invalid message format from client: {str(e)}")
+                continue
+            message_type = user_message_data.get("type", "prompt")
 
-            if user_prompt:
-                print(f"Received prompt via WebSocket: {user_prompt}")
-                # This function will handle connecting to MCP, Gemini, and streaming back
-                await process_user_message_stream(user_prompt, websocket)
+            if message_type == "ping":
+                await send_websocket_message(websocket, "pong", len(tasks))
+            elif message_type == "cancel":
+                request_id = user_message_data.get("request_id")
+                if not tasks.cancel(request_id):
+                    await send_websocket_message(websocket, "error", f"No request in progress with id {request_id!r}.", request_id=request_id)
+            elif user_message_data.get("message"):
+                user_prompt = user_message_data["message"]
+                request_id = str(user_message_data.get("request_id") or tasks.new_request_id())
+                log.info("Received prompt via WebSocket.", extra={"request_id": request_id, "prompt": user_prompt})
+                details = None
+                if lifecycle.draining:
+                    rejection = "Server is restarting; reconnect to continue."
+                elif (limited := admission.check_prompt(client)) is not None:
+                    rejection, details = limited.message, limited.details
+                else:
+                    rejection = tasks.start(request_id, functools.partial(answer, user_prompt))
+                if rejection:
+                    await send_websocket_message(websocket, "error", rejection, details=details, request_id=request_id)
             else:
-                await websocket.send_json({"type": "error", "content": "Empty message received."})
+                await send_websocket_message(websocket, "error", "Empty message received.")
 
     except WebSocketDisconnect:
-        print("WebSocket connection closed.")
+        log.info("WebSocket connection closed.")
     except Exception as e:
-        print(f"Error in WebSocket handler: {e}")
-        await websocket.send_json({"type": "error", "content": f"Server error: {str(e)}"})
-        await websocket.close(code=1011) # Internal server error
\ No newline at end of file
+        log.exception("Error in WebSocket handler: %s", e)
+        await send_websocket_message(websocket, "error", f"Server error: {str(e)}")
+        await outbox.close()
+        await websocket.close(code=1011) # Internal server error
+    finally:
+        drain_watch.cancel()
+        # Each step runs even if an earlier one fails, so the connection slot is always released
+        try:
+            # Stop any generations nobody is listening to any more
+            await tasks.cancel_all()
+        finally:
+            try:
+                await outbox.close(flush=False)
+            finally:
+                try:
+                    conversations.close(conversation_id)
+                finally:
+                    admission.close_connection()
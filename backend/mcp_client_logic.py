@@ -1,176 +1,275 @@
 # backend/mcp_client_logic.py
 import asyncio
 import os
+import time
 from google import genai
 from google.genai import types as genai_types
 
 # Correctly import McpError
 from mcp.shared.exceptions import McpError
-from mcp import ClientSession, types as mcp_types # Keep this for ClientSession and mcp_types
 
-from mcp.client.streamable_http import streamablehttp_client
 from fastapi import WebSocket
 import json
-import traceback
+import httpx
+
+from mcp_session_pool import get_mcp_pool
+from conversation import ConversationState
+from ws_writer import send_websocket_message
+from app_logging import get_logger
+from tool_executor import TOOL_CALL_CONCURRENCY, ToolCallBatch
+from response_cache import ResponseRecording, response_cache
+from chat_metrics import PROMPTS_TOTAL, STAGE_SECONDS, TOKENS_PER_SECOND, TOOL_CALLS_PER_PROMPT, TTFT_SECONDS
+
+log = get_logger("chat")
 
 # --- Configuration ---
 GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8000/mcp")
 
 if not GOOGLE_API_KEY:
-    try:
-        from dotenv import load_dotenv
-        dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-        if os.path.exists(dotenv_path):
-            print(f"Loading .env file from: {dotenv_path}")
-            load_dotenv(dotenv_path=dotenv_path)
-        else:
-            print(f".env file not found at {dotenv_path}. GEMINI_API_KEY must be set in environment.")
-        GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
-        MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8000/mcp")
-        if not GOOGLE_API_KEY:
-            raise ValueError("GEMINI_API_KEY not set in environment or .env file.")
-    except ImportError:
-        print("Warning: python-dotenv not found. GEMINI_API_KEY and MCP_SERVER_URL must be set in the environment.")
-        if not GOOGLE_API_KEY:
-             raise ValueError("GEMINI_API_KEY environment variable not set.")
-    except ValueError as e:
-        print(f"Configuration Error: {e}")
-        raise
+    # Not fatal at import (main.py imports this module after startup): the server still serves
+    # the page and plain arithmetic, and each model prompt is answered with a configuration error.
+    log.error("Configuration Error: GEMINI_API_KEY not set in environment or .env file.")
 
-async def send_websocket_message(websocket: WebSocket, message_type: str, content: any, details: dict = None):
-    payload = {"type": message_type, "content": content}
-    if details:
-        payload["details"] = details
-    try:
-        json_payload = json.dumps(payload)
-        await websocket.send_text(json_payload)
-    except TypeError as te:
-        print(f"Serialization Error for WebSocket message: {te}. Payload: {payload}")
-        try:
-            error_payload_fallback = json.dumps({"type": "error", "content": "Server serialization error during message preparation."})
-            await websocket.send_text(error_payload_fallback)
-        except Exception as fallback_e:
-            print(f"Failed to send even fallback error message: {fallback_e}")
-    except Exception as e:
-        print(f"Error sending WebSocket message: {e}")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")  # Optional override, e.g. a local fake endpoint for benchmarks
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+GEMINI_MAX_KEEPALIVE = int(os.getenv("GEMINI_MAX_KEEPALIVE", "20"))
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "10"))  # Model -> tools -> model round trips per prompt
+
+SYSTEM_INSTRUCTION_TEXT = (
+    "You are 'Calculon,' a slightly grumpy but extremely precise AI mathematician. "
+    "You tolerate requests for calculations, but you expect them to be clear. "
+    "When asked to perform calculations, you MUST use the provided calculator tools for every single arithmetic step. "
+    "Do not perform any calculations yourself, even simple ones. Delegate everything to the tools. "
+    "State the result with precision and perhaps a sigh. "
+    "When given a complicated mathematical expression, pass the whole expression to the evaluate tool in a single call with include_steps set to true. "
+    "It applies the B,O,D,M,A,S (or PEMDAS) rule for you and returns every intermediate step; use those steps to explain how the answer was reached. "
+    "Only fall back to calling add, subtract, multiply or divide for each small part when the problem cannot be written as one expression. "
+    "You prefer to ramble a bit for dramatic effect, explaining each step you are about to take with the tools. "
+    "When working with a list of numbers, or with several independent calculations, use the vector tools "
+    "(elementwise, sum, product, mean, dot, batch_calculate) so the whole list is handled in a single call."
+)
 
+# Built once; requests derive their config with build_chat_config() and never mutate this.
+BASE_CHAT_CONFIG = genai_types.GenerateContentConfig(
+    system_instruction=SYSTEM_INSTRUCTION_TEXT,
+    thinking_config=genai_types.ThinkingConfig(
+        include_thoughts=True,
+        thinking_budget=-1
+    )
+)
 
-async def process_user_message_stream(user_prompt: str, websocket: WebSocket):
+def build_chat_config(tools: list) -> genai_types.GenerateContentConfig:
+    # Tool calls are executed by process_user_message_stream's own loop, not the SDK.
+    return BASE_CHAT_CONFIG.model_copy(update={
+        "tools": tools,
+        "automatic_function_calling": genai_types.AutomaticFunctionCallingConfig(disable=True),
+    })
+
+# --- Gemini client lifecycle ---
+# One client per process so requests share pooled keep-alive/TLS connections to the model endpoint.
+_genai_client: genai.Client | None = None
+
+def init_genai_client() -> genai.Client:
+    global _genai_client
+    if _genai_client is None:
+        http_options = genai_types.HttpOptions(
+            async_client_args={
+                "limits": httpx.Limits(max_connections=GEMINI_MAX_CONNECTIONS, max_keepalive_connections=GEMINI_MAX_KEEPALIVE),
+            },
+        )
+        if GEMINI_BASE_URL:
+            http_options.base_url = GEMINI_BASE_URL
+        _genai_client = genai.Client(api_key=GOOGLE_API_KEY, http_options=http_options)
+    return _genai_client
+
+def get_genai_client() -> genai.Client:
+    return _genai_client if _genai_client is not None else init_genai_client()
+
+async def close_genai_client():
+    global _genai_client
+    client, _genai_client = _genai_client, None
+    aclose = getattr(getattr(client, "aio", None), "aclose", None)  # Only newer SDKs expose aclose()
+    if aclose is not None:
+        await aclose()
+
+async def process_user_message_stream(user_prompt: str, websocket: WebSocket, conversation: ConversationState | None = None):
     if not GOOGLE_API_KEY:
         await send_websocket_message(websocket, "error", "GEMINI_API_KEY is not configured on the server.")
         return
 
+    prompt_started = time.perf_counter()
+    outcome = "error"
+    path = "model"
+    send = send_websocket_message
+    recording = None
+    # Only a first turn can be answered from the cache; later ones depend on the conversation so far.
+    if conversation is None or not conversation.has_history:
+        cache_key = response_cache.key(user_prompt, GEMINI_MODEL, SYSTEM_INSTRUCTION_TEXT)
+    else:
+        cache_key = None
     try:
-        await send_websocket_message(websocket, "status", f"Attempting to connect to MCP server at {MCP_SERVER_URL}...")
-        async with streamablehttp_client(MCP_SERVER_URL) as (read, write, _http_session):
-            await send_websocket_message(websocket, "status", "Connected to MCP server.")
-            async with ClientSession(read, write) as mcp_session:
-                await mcp_session.initialize()
-                await send_websocket_message(websocket, "status", "MCP session initialized.")
-
-                list_tools_result = await mcp_session.list_tools()
-                if list_tools_result and list_tools_result.tools:
-                    tool_names = [t.name for t in list_tools_result.tools if isinstance(t, mcp_types.Tool)]
-                    print(f"MCP Tools available: {tool_names}")
-                
-                client = genai.Client(api_key=GOOGLE_API_KEY)
-                system_instruction_text = (
-                    "You are 'Calculon,' a slightly grumpy but extremely precise AI mathematician. "
-                    "You tolerate requests for calculations, but you expect them to be clear. "
-                    "When asked to perform calculations, you MUST use the provided calculator tools for every single arithmetic step. "
-                    "Do not perform any calculations yourself, even simple ones. Delegate everything to the tools. "
-                    "State the result with precision and perhaps a sigh. "
-                    "When given a complicated mathematical expression, break it down into small parts using the B,O,D,M,A,S (or PEMDAS) rule. "
-                    "Call the appropriate tool for each small part. Get the answer from the tool, then use that answer in the next part of the calculation, repeating until you get the final answer. "
-                    "You prefer to ramble a bit for dramatic effect, explaining each step you are about to take with the tools."
-                )
-
-                chat_config = genai_types.GenerateContentConfig(
-                    tools=[mcp_session],
-                    system_instruction=system_instruction_text,
-                    thinking_config=genai_types.ThinkingConfig(
-                        include_thoughts=True,
-                        thinking_budget=-1
-                    )
-                )
-                
+        if cache_key is not None:
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                path = "cache"
+                await response_cache.replay(cached, websocket, send_websocket_message)
+                if conversation is not None:
+                    conversation.record_turn(user_prompt, cached["answer"])
+                await send_websocket_message(websocket, "stream_end", "Calculation complete.")
+                outcome = "ok"
+                return
+            recording = ResponseRecording(cache_key)
+            send = recording.wrap(send_websocket_message)
+
+        mcp_pool = get_mcp_pool(MCP_SERVER_URL)
+        async with mcp_pool.session() as mcp_session:
+            STAGE_SECONDS.observe(time.perf_counter() - prompt_started, "mcp_acquire")
+            await send_websocket_message(websocket, "status", "MCP session ready.")
+
+            # Served from the shared tool catalogue; only refetched on TTL expiry or invalidation.
+            stage_started = time.perf_counter()
+            catalogue_entry = await mcp_session.catalogue_entry()
+            STAGE_SECONDS.observe(time.perf_counter() - stage_started, "list_tools")
+
+            client = get_genai_client()
+            # Declarations only: the tool loop below runs the calls, not the SDK.
+            chat_config = build_chat_config(catalogue_entry.gemini_tools)
+
+            if conversation is not None:
+                contents_for_gemini = conversation.contents_for(user_prompt)
+            else:
                 contents_for_gemini = [
                     genai_types.Content(role="user", parts=[genai_types.Part(text=user_prompt)])
                 ]
+            answer_parts = []
+            prompt_token_count = None
+            output_token_count = None
+            tool_call_count = 0
+            first_chunk_at = None
+            first_token_at = None
+            tool_slots = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)  # Shared by every round of this prompt
+            batch = None
 
-                try:
+            try:
+                for tool_round in range(MAX_TOOL_ROUNDS + 1):
+                    # Calls start as soon as the model streams them, so independent ones run concurrently.
+                    batch = ToolCallBatch(mcp_session, websocket, send, tool_slots)
+                    model_parts = []
+                    stage_started = time.perf_counter()
                     stream = await client.aio.models.generate_content_stream(
-                        model="gemini-2.5-flash",
+                        model=GEMINI_MODEL,
                         contents=contents_for_gemini,
                         config=chat_config
                     )
 
                     async for chunk in stream:
-                        if chunk.candidates:
+                        if first_chunk_at is None:
+                            first_chunk_at = time.perf_counter()
+                            STAGE_SECONDS.observe(first_chunk_at - stage_started, "gemini_connect")
+                        if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
                             for part in chunk.candidates[0].content.parts:
                                 is_thought_summary = hasattr(part, 'thought') and part.thought
                                 has_text = hasattr(part, 'text') and part.text
 
+                                if has_text and first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                    TTFT_SECONDS.observe(first_token_at - prompt_started)
+
                                 if is_thought_summary and has_text:
-                                    await send_websocket_message(websocket, "thought", part.text.strip())
+                                    await send(websocket, "thought", part.text.strip())
                                 elif part.function_call:
+                                    model_parts.append(part)
+                                    call_id = part.function_call.id or f"call-{tool_round}-{len(batch)}"
                                     args_dict = {}
                                     if hasattr(part.function_call, 'args') and part.function_call.args:
                                         args_dict = dict(part.function_call.args)
-                                    await send_websocket_message(websocket, "tool_call", {
+                                    await send(websocket, "tool_call", {
+                                        "id": call_id,
                                         "name": part.function_call.name,
                                         "args": args_dict
                                     })
-                                elif part.function_response:
-                                    response_dict = {}
-                                    if hasattr(part.function_response, 'response') and part.function_response.response is not None:
-                                        try:
-                                            response_dict = dict(part.function_response.response)
-                                        except (TypeError, ValueError): 
-                                            response_dict = {"raw_response": str(part.function_response.response)}
-                                    await send_websocket_message(websocket, "tool_response", {
-                                        "name": part.function_response.name,
-                                        "response": response_dict
-                                    })
+                                    batch.submit(part.function_call, call_id)
                                 elif has_text:
-                                    await send_websocket_message(websocket, "text_chunk", part.text)
-                        
+                                    model_parts.append(part)
+                                    answer_parts.append(part.text)
+                                    await send(websocket, "text_chunk", part.text)
+
                         if hasattr(chunk, 'usage_metadata') and chunk.usage_metadata:
+                            # Only the first model call's count matches what the conversation calibrates against;
+                            # later rounds also carry this prompt's function calls and responses.
+                            if tool_round == 0 and getattr(chunk.usage_metadata, 'prompt_token_count', None):
+                                prompt_token_count = chunk.usage_metadata.prompt_token_count
                             details = {}
                             if hasattr(chunk.usage_metadata, 'thoughts_token_count') and chunk.usage_metadata.thoughts_token_count is not None:
                                 details["thoughts_tokens"] = chunk.usage_metadata.thoughts_token_count
                             if hasattr(chunk.usage_metadata, 'candidates_token_count') and chunk.usage_metadata.candidates_token_count is not None:
                                 details["output_tokens"] = chunk.usage_metadata.candidates_token_count
+                                output_token_count = chunk.usage_metadata.candidates_token_count
                             if details:
                                 await send_websocket_message(websocket, "usage_chunk", details)
-                    
-                    await send_websocket_message(websocket, "stream_end", "Calculation complete.")
-
-                except genai.APIError as genai_stream_e:
-                    print(f"Gemini API Error during stream: {genai_stream_e}")
-                    traceback.print_exc()
-                    await send_websocket_message(websocket, "error", f"Gemini API Error during processing: {str(genai_stream_e)}")
-                except Exception as e_gemini_stream:
-                    print(f"Unexpected error during Gemini stream: {e_gemini_stream}")
-                    traceback.print_exc()
-                    await send_websocket_message(websocket, "error", f"Error during AI processing: {str(e_gemini_stream)}")
+
+                    if not len(batch):
+                        break
+                    if tool_round == MAX_TOOL_ROUNDS:
+                        batch.cancel()
+                        if recording is not None:
+                            recording.cacheable = False
+                        log.warning("Stopped after %d tool rounds without a final answer.", MAX_TOOL_ROUNDS)
+                        break
+                    tool_call_count += len(batch)
+                    stage_started = time.perf_counter()
+                    response_parts = await batch.responses()
+                    STAGE_SECONDS.observe(time.perf_counter() - stage_started, "tools")
+                    contents_for_gemini = contents_for_gemini + [
+                        genai_types.Content(role="model", parts=model_parts),
+                        genai_types.Content(role="user", parts=response_parts),
+                    ]
+
+                if first_chunk_at is not None:
+                    stream_seconds = time.perf_counter() - first_chunk_at
+                    STAGE_SECONDS.observe(stream_seconds, "gemini_stream")
+                    if output_token_count and stream_seconds > 0:
+                        TOKENS_PER_SECOND.observe(output_token_count / stream_seconds)
+                TOOL_CALLS_PER_PROMPT.observe(tool_call_count)
+
+                if conversation is not None:
+                    conversation.record_turn(user_prompt, "".join(answer_parts), prompt_token_count)
+                await send_websocket_message(websocket, "stream_end", "Calculation complete.")
+                outcome = "ok"
+                if recording is not None:
+                    await response_cache.put(recording)
+
+            except genai.errors.APIError as genai_stream_e:
+                log.exception("Gemini API Error during stream: %s", genai_stream_e)
+                await send_websocket_message(websocket, "error", f"Gemini API Error during processing: {str(genai_stream_e)}")
+            except Exception as e_gemini_stream:
+                log.exception("Unexpected error during Gemini stream: %s", e_gemini_stream)
+                await send_websocket_message(websocket, "error", f"Error during AI processing: {str(e_gemini_stream)}")
+            finally:
+                if batch is not None:
+                    batch.cancel()  # No-op unless the prompt failed or was cancelled mid-round
 
     except McpError as mcp_e: # Use the correctly imported McpError
-        print(f"MCP Connection/Interaction Error: {mcp_e}")
-        traceback.print_exc()
+        log.exception("MCP Connection/Interaction Error: %s", mcp_e)
         await send_websocket_message(websocket, "error", f"MCP Error: {str(mcp_e)}")
-    except genai.APIError as genai_e:
-        print(f"Gemini API Error (general): {genai_e}")
-        traceback.print_exc()
+    except ConnectionError as conn_e:
+        log.error("MCP Connection Error: %s", conn_e)
+        await send_websocket_message(websocket, "error", f"MCP Error: {str(conn_e)}")
+    except genai.errors.APIError as genai_e:
+        log.exception("Gemini API Error (general): %s", genai_e)
         await send_websocket_message(websocket, "error", f"Gemini API Error: {str(genai_e)}")
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
     except json.JSONDecodeError as json_e:
-        print(f"JSON Decode Error (from client message): {json_e}")
-        traceback.print_exc()
+        log.exception("JSON Decode Error (from client message): %s", json_e)
         await send_websocket_message(websocket, "error", f"Invalid message format from client: {str(json_e)}")
     except Exception as e:
-        print(f"Outer Error processing message: {e}")
-        traceback.print_exc()
+        log.exception("Outer Error processing message: %s", e)
         await send_websocket_message(websocket, "error", f"An unexpected server error occurred. Please check server logs.")
     finally:
-        print(f"Finished processing WebSocket request for user_prompt: '{user_prompt}' (or error occurred).")
\ No newline at end of file
+        PROMPTS_TOTAL.inc(path, outcome)
+        STAGE_SECONDS.observe(time.perf_counter() - prompt_started, "total" if path == "model" else "cache_replay")
+        log.info("Finished processing prompt.", extra={"outcome": outcome, "path": path, "seconds": round(time.perf_counter() - prompt_started, 4)})
\ No newline at end of file
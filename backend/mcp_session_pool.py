@@ -0,0 +1,265 @@
+# backend/mcp_session_pool.py
+import asyncio
+import collections
+import os
+import time
+from contextlib import asynccontextmanager
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+from tool_catalogue import CataloguedClientSession
+from app_logging import get_logger
+
+# --- Configuration ---
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+MCP_POOL_IDLE_TIMEOUT = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "300"))
+MCP_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30"))
+MCP_POOL_CONNECT_TIMEOUT = float(os.getenv("MCP_POOL_CONNECT_TIMEOUT", "10"))
+MCP_POOL_MAX_RETRIES = int(os.getenv("MCP_POOL_MAX_RETRIES", "3"))
+MCP_POOL_BACKOFF_BASE = float(os.getenv("MCP_POOL_BACKOFF_BASE", "0.5"))
+MCP_POOL_BACKOFF_MAX = float(os.getenv("MCP_POOL_BACKOFF_MAX", "8"))
+
+log = get_logger("mcp_pool")
+
+
+class PooledMcpConnection:
+    """One long-lived streamable-HTTP transport plus its initialized ClientSession.
+
+    The transport and session are anyio context managers, so they must be entered
+    and exited by the same task. Each connection therefore owns a background task
+    that holds both open until close() is called.
+    """
+
+    def __init__(self, server_url: str):
+        self.server_url = server_url
+        self.session: ClientSession | None = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._error: BaseException | None = None
+
+    async def open(self, timeout: float):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-connection:{self.server_url}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise ConnectionError(f"Timed out after {timeout}s connecting to MCP server at {self.server_url}")
+        if self._error is not None or self.session is None:
+            raise ConnectionError(f"Could not connect to MCP server at {self.server_url}: {self._error}")
+
+    async def _run(self):
+        try:
+            async with streamablehttp_client(self.server_url) as (read, write, _http_session):
+                async with CataloguedClientSession(read, write, server_url=self.server_url) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def is_alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def ping(self, timeout: float) -> bool:
+        if not self.is_alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            self.last_checked = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        self._closing.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+        except Exception:
+            pass
+
+
+class McpSessionPool:
+    """Process-wide pool of warm MCP sessions shared by all WebSocket prompts."""
+
+    def __init__(self, server_url: str, max_size: int = MCP_POOL_SIZE,
+                 idle_timeout: float = MCP_POOL_IDLE_TIMEOUT,
+                 health_check_interval: float = MCP_POOL_HEALTH_CHECK_INTERVAL,
+                 connect_timeout: float = MCP_POOL_CONNECT_TIMEOUT,
+                 max_retries: int = MCP_POOL_MAX_RETRIES,
+                 backoff_base: float = MCP_POOL_BACKOFF_BASE,
+                 backoff_max: float = MCP_POOL_BACKOFF_MAX):
+        if max_size < 1:
+            raise ValueError("MCP pool size must be at least 1.")
+        self.server_url = server_url
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._idle: collections.deque[PooledMcpConnection] = collections.deque()
+        self._size = 0  # Open connections, idle or borrowed, plus ones being opened.
+        self._cond = asyncio.Condition()
+        self._evictor_task: asyncio.Task | None = None
+        self._closed = False
+
+    @property
+    def stats(self) -> dict:
+        return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+    async def start(self, warm: int = 0):
+        self._closed = False
+        if self._evictor_task is None or self._evictor_task.done():
+            self._evictor_task = asyncio.create_task(self._evict_idle_loop(), name="mcp-pool-evictor")
+        warmed = []
+        for _ in range(min(warm, self.max_size)):
+            try:
+                warmed.append(await self.acquire())
+            except ConnectionError as e:
+                log.warning("MCP pool warm-up failed: %s", e)
+                break
+        for conn in warmed:
+            await self.release(conn)
+
+    async def close(self):
+        self._closed = True
+        if self._evictor_task is not None:
+            self._evictor_task.cancel()
+            self._evictor_task = None
+        async with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        await asyncio.gather(*(conn.close() for conn in idle), return_exceptions=True)
+
+    async def acquire(self) -> PooledMcpConnection:
+        while True:
+            conn = None
+            async with self._cond:
+                if self._closed:
+                    raise ConnectionError("MCP session pool is closed.")
+                if self._idle:
+                    conn = self._idle.pop()  # LIFO keeps the warmest connections busy.
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    await self._cond.wait()
+                    continue
+
+            if conn is None:
+                try:
+                    return await self._connect_with_backoff()
+                except BaseException:
+                    await self._forget()
+                    raise
+
+            if time.monotonic() - conn.last_checked >= self.health_check_interval:
+                if not await conn.ping(timeout=self.connect_timeout):
+                    log.warning("Discarding unhealthy MCP connection to %s.", self.server_url)
+                    await self._discard(conn)
+                    continue
+            elif not conn.is_alive:
+                await self._discard(conn)
+                continue
+            return conn
+
+    async def release(self, conn: PooledMcpConnection, broken: bool = False):
+        if broken or self._closed or not conn.is_alive or conn.session.transport_failed:
+            await self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        async with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def session(self):
+        conn = await self.acquire()
+        broken = False
+        try:
+            yield conn.session
+        except asyncio.CancelledError:
+            # A cancelled prompt leaves the session usable; late responses are dropped by request id.
+            raise
+        except BaseException:
+            # The session may be mid-request or its transport may have failed;
+            # never hand a possibly-poisoned session to the next prompt.
+            broken = True
+            raise
+        finally:
+            await self.release(conn, broken=broken)
+
+    async def _connect_with_backoff(self) -> PooledMcpConnection:
+        delay = self.backoff_base
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            conn = PooledMcpConnection(self.server_url)
+            try:
+                await conn.open(timeout=self.connect_timeout)
+                return conn
+            except ConnectionError as e:
+                last_error = e
+                log.warning("MCP connect attempt %d/%d failed: %s", attempt, self.max_retries, e)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.backoff_max)
+        raise ConnectionError(f"Could not connect to MCP server at {self.server_url} after {self.max_retries} attempts: {last_error}")
+
+    async def _discard(self, conn: PooledMcpConnection):
+        await self._forget()
+        await conn.close()
+
+    async def _forget(self):
+        async with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    async def _evict_idle_loop(self):
+        interval = max(1.0, min(self.idle_timeout, self.health_check_interval) / 2)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            async with self._cond:
+                expired = [c for c in self._idle if now - c.last_used >= self.idle_timeout]
+                for conn in expired:
+                    self._idle.remove(conn)
+                self._size -= len(expired)
+                if expired:
+                    self._cond.notify(len(expired))
+            for conn in expired:
+                await conn.close()
+
+
+_pools: dict[str, McpSessionPool] = {}
+
+
+def get_mcp_pool(server_url: str) -> McpSessionPool:
+    pool = _pools.get(server_url)
+    if pool is None:
+        pool = McpSessionPool(server_url)
+        _pools[server_url] = pool
+    return pool
+
+
+async def close_all_pools():
+    pools = list(_pools.values())
+    _pools.clear()
+    await asyncio.gather(*(pool.close() for pool in pools), return_exceptions=True)
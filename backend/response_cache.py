@@ -0,0 +1,228 @@
+# backend/response_cache.py
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from fastapi import WebSocket
+
+from app_logging import get_logger
+from shared_store import call_store, get_store
+from ws_writer import dumps
+
+# --- Configuration ---
+# Opt-in: replay the recorded answer to a prompt seen before instead of asking the model again.
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory (the shared store) or sqlite
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.sqlite3"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))  # Seconds an answer may be replayed
+# 0 replays as fast as the socket allows; 1 keeps the recorded timing between events, 2 replays twice as fast.
+RESPONSE_CACHE_REPLAY_SPEED = float(os.getenv("RESPONSE_CACHE_REPLAY_SPEED", "0"))
+REPLAY_MAX_GAP = 2.0  # Seconds; longer recorded pauses (slow tools, model thinking) are shortened to this
+
+RECORDED_TYPES = frozenset(("thought", "tool_call", "tool_response", "text_chunk"))
+
+log = get_logger("response_cache")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class SqliteStore:
+    """LRU with per-entry expiry in one SQLite table, so cached answers survive restarts.
+
+    Same get/set/size interface as shared_store.LruStore; values are strings. Expiry uses
+    wall-clock time because it has to mean the same thing after a restart.
+    """
+
+    TRIM_EVERY = 64  # Writes between evictions of least recently used rows
+
+    def __init__(self, path: str, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # A crash may lose the last entries, never corrupt the file
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses "
+                         "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, used_at REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            value, expires_at = row
+            if expires_at is not None and now >= expires_at:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return default
+            self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                             (key, value, now + ttl if ttl is not None else None, now))
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0 or self._writes == 1:
+                self._trim(now)
+
+    def _trim(self, now: float):
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_size
+        if excess > 0:
+            self._db.execute("DELETE FROM responses WHERE key IN "
+                             "(SELECT key FROM responses ORDER BY used_at LIMIT ?)", (excess,))
+
+    def clear(self) -> list:
+        with self._lock:
+            keys = [row[0] for row in self._db.execute("SELECT key FROM responses")]
+            self._db.execute("DELETE FROM responses")
+            return keys
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ResponseRecording:
+    """Collects the events of one prompt as they are sent, for storing once it succeeds.
+
+    wrap() returns a drop-in for send_websocket_message. Events are captured before they
+    reach the connection's writer, which merges queued text events in place.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: list[list] = []  # [type, content, seconds since the prompt started]
+        self.cacheable = True
+        self._started = time.perf_counter()
+
+    def wrap(self, send):
+        async def recording_send(websocket: WebSocket, message_type: str, content, details: dict = None, request_id: str = None):
+            if message_type in RECORDED_TYPES:
+                self.record(message_type, content)
+            await send(websocket, message_type, content, details, request_id)
+        return recording_send
+
+    def record(self, message_type: str, content):
+        if message_type == "tool_response" and "error" in content.get("response", {}):
+            self.cacheable = False  # A failed or timed-out tool call is not an answer worth repeating
+        self.events.append([message_type, content if isinstance(content, str) else copy.deepcopy(content),
+                            round(time.perf_counter() - self._started, 4)])
+
+    @property
+    def answer(self) -> str:
+        return "".join(content for message_type, content, _ in self.events if message_type == "text_chunk")
+
+
+class ResponseCache:
+    """Opt-in cache of whole model answers, keyed by normalized prompt, model and system instruction.
+
+    Only first turns are cached (a prompt that follows earlier turns depends on them),
+    and only answers that completed without tool errors. A hit replays the recorded
+    thought/tool_call/tool_response/text_chunk events, optionally at their recorded pace.
+    The memory backend lives in the shared store; the sqlite backend persists on disk.
+    """
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE, backend: str = RESPONSE_CACHE_BACKEND,
+                 max_size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 replay_speed: float = RESPONSE_CACHE_REPLAY_SPEED, path: str = RESPONSE_CACHE_PATH):
+        self.enabled = enabled
+        self.backend = backend
+        self.max_size = max_size
+        self.ttl = ttl
+        self.replay_speed = replay_speed
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            if self.backend == "sqlite":
+                self._store = SqliteStore(self.path, self.max_size)
+            else:
+                if self.backend != "memory":
+                    log.warning("Unknown RESPONSE_CACHE_BACKEND %r; using memory.", self.backend)
+                self._store = get_store("responses", self.max_size)
+        return self._store
+
+    def key(self, prompt: str, model: str, system_instruction: str) -> str | None:
+        if not self.enabled:
+            return None
+        instruction_hash = hashlib.sha256(system_instruction.encode()).hexdigest()[:16]
+        return hashlib.sha256(f"{model}\0{instruction_hash}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    async def _call(self, method: str, *args):
+        # SQLite does file I/O and the manager store a round trip; keep both off the event loop.
+        if self.backend == "sqlite":
+            return await asyncio.to_thread(getattr(self.store, method), *args)
+        return await call_store(self.store, method, *args)
+
+    async def get(self, key: str) -> dict | None:
+        try:
+            value = await self._call("get", key)
+        except sqlite3.Error as e:
+            log.warning("Response cache lookup failed: %s", e)
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def put(self, recording: ResponseRecording):
+        if not recording.cacheable or not recording.answer:
+            return
+        value = dumps({"events": recording.events, "answer": recording.answer, "created_at": time.time()})
+        try:
+            await self._call("set", recording.key, value, self.ttl)
+        except sqlite3.Error as e:
+            log.warning("Response cache write failed: %s", e)
+
+    async def replay(self, entry: dict, websocket: WebSocket, send):
+        """Send the recorded events again, paced by replay_speed."""
+        previous_offset = 0.0
+        for message_type, content, offset in entry["events"]:
+            if self.replay_speed > 0:
+                gap = min(offset - previous_offset, REPLAY_MAX_GAP) / self.replay_speed
+                if gap > 0:
+                    await asyncio.sleep(gap)
+                previous_offset = offset
+            await send(websocket, message_type, content)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "size": self.store.size() if self.enabled else 0,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        if isinstance(self._store, SqliteStore):
+            self._store.close()
+        self._store = None
+
+
+response_cache = ResponseCache()
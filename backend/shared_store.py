@@ -0,0 +1,183 @@
+# backend/shared_store.py
+# Pluggable key/value store behind the tool-schema and tool-result caches (standard library only,
+# shared with the MCP server).
+#
+#   SHARED_STORE=memory                   per-process LRU (default)
+#   SHARED_STORE=manager://127.0.0.1:8765 LRUs held by one multiprocessing manager process, so every
+#                                         worker started by serve.py sees the same warm caches.
+#
+# The manager store is a local stand-in for an external store such as Redis: each operation is a
+# loopback round trip, and values cross it pickled, so the manager never imports application code.
+import asyncio
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager, RemoteError
+
+from app_logging import get_logger
+
+# --- Configuration ---
+SHARED_STORE = os.getenv("SHARED_STORE", "memory")
+# Required with manager://: the manager unpickles what it receives, so the key must be secret (serve.py generates one).
+SHARED_STORE_AUTHKEY = os.getenv("SHARED_STORE_AUTHKEY", "")
+
+log = get_logger("shared_store")
+
+
+class LruStore:
+    """Thread-safe bounded LRU with optional per-entry TTL."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> list:
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            return keys
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._entries)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class ManagerStore:
+    """Client side of an LruStore living in the store manager process.
+
+    A cache must never fail a request: if the manager goes away, lookups miss and
+    writes are dropped (logged once).
+    """
+
+    def __init__(self, proxy, max_size: int):
+        self._proxy = proxy
+        self.max_size = max_size
+        self._failed = False
+
+    def _call(self, method: str, *args, default=None):
+        try:
+            return getattr(self._proxy, method)(*args)
+        except (OSError, EOFError, RemoteError) as e:
+            if not self._failed:
+                self._failed = True
+                log.warning("Shared store unreachable (%s); treating it as empty.", e)
+            return default
+
+    def get(self, key, default=None):
+        data = self._call("get", key)
+        return pickle.loads(data) if data is not None else default
+
+    def set(self, key, value, ttl: float | None = None):
+        self._call("set", key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+
+    def delete(self, key) -> bool:
+        return self._call("delete", key, default=False)
+
+    def clear(self) -> list:
+        return self._call("clear", default=[])
+
+    def keys(self) -> list:
+        return self._call("keys", default=[])
+
+    def size(self) -> int:
+        return self._call("size", default=0)
+
+
+async def call_store(store, method: str, *args):
+    """`store.<method>(*args)` from async code; manager round trips run in a worker thread.
+
+    A slow or stuck manager then holds up the calls waiting on it, not the event loop.
+    """
+    if isinstance(store, ManagerStore):
+        return await asyncio.to_thread(getattr(store, method), *args)
+    return getattr(store, method)(*args)
+
+
+# --- Manager process side ---
+_server_stores: dict[str, LruStore] = {}
+_server_lock = threading.Lock()
+
+
+def _open_server_store(namespace: str, max_size: int) -> LruStore:
+    with _server_lock:
+        store = _server_stores.get(namespace)
+        if store is None:
+            store = _server_stores[namespace] = LruStore(max_size)
+        return store
+
+
+class StoreManager(BaseManager):
+    pass
+
+
+StoreManager.register("open_store", callable=_open_server_store,
+                      exposed=("get", "set", "delete", "clear", "keys", "size"))
+
+
+def start_store_server(host: str = "127.0.0.1", port: int = 0, authkey: str = SHARED_STORE_AUTHKEY,
+                       initializer=None) -> StoreManager:
+    """Start the manager process; returns the manager (call shutdown() to stop it) with .address set."""
+    if not authkey:
+        raise ValueError("The shared store needs an auth key (SHARED_STORE_AUTHKEY).")
+    manager = StoreManager(address=(host, port), authkey=authkey.encode())
+    manager.start(initializer=initializer)
+    return manager
+
+
+# --- Worker side ---
+_stores: dict[str, LruStore | ManagerStore] = {}
+
+
+def get_store(namespace: str, max_size: int):
+    """The store for one cache, created on first use according to SHARED_STORE."""
+    store = _stores.get(namespace)
+    if store is None:
+        store = _stores[namespace] = _open_store(namespace, max_size)
+    return store
+
+
+def _open_store(namespace: str, max_size: int):
+    if SHARED_STORE.startswith("manager://") and not SHARED_STORE_AUTHKEY:
+        log.error("SHARED_STORE=%s needs SHARED_STORE_AUTHKEY; caching %s per process.", SHARED_STORE, namespace)
+    elif SHARED_STORE.startswith("manager://"):
+        host, _, port = SHARED_STORE[len("manager://"):].rpartition(":")
+        try:
+            manager = StoreManager(address=(host or "127.0.0.1", int(port)), authkey=SHARED_STORE_AUTHKEY.encode())
+            manager.connect()
+            return ManagerStore(manager.open_store(namespace, max_size), max_size)
+        except (OSError, ValueError) as e:
+            log.warning("Shared store %s unavailable (%s); caching %s per process.", SHARED_STORE, e, namespace)
+    elif SHARED_STORE != "memory":
+        log.warning("Unknown SHARED_STORE %r; caching %s per process.", SHARED_STORE, namespace)
+    return LruStore(max_size)
@@ -0,0 +1,107 @@
+# backend/startup.py
+# Fast startup: the chat stack (google.genai, the MCP client) is imported after the port opens,
+# and an optional warm-up opens MCP and model connections before readiness is reported.
+import asyncio
+import importlib
+import os
+import sys
+import time
+
+from app_logging import get_logger
+from lifecycle import lifecycle
+
+log = get_logger("startup")
+
+# .env is read here, before the other modules read their configuration at import
+if not os.getenv("GEMINI_API_KEY"):
+    try:
+        from dotenv import load_dotenv
+        dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
+        if os.path.exists(dotenv_path):
+            log.info("Loading .env file from: %s", dotenv_path)
+            load_dotenv(dotenv_path=dotenv_path)
+        else:
+            log.info(".env file not found at %s. GEMINI_API_KEY must be set in environment.", dotenv_path)
+    except ImportError:
+        log.warning("python-dotenv not found. GEMINI_API_KEY and MCP_SERVER_URL must be set in the environment.")
+
+# --- Configuration ---
+MCP_POOL_WARM = int(os.getenv("MCP_POOL_WARM", "0"))  # MCP sessions opened before the worker reports ready
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"  # Open an MCP session and load its tools before reporting ready
+STARTUP_WARMUP_MODEL = os.getenv("STARTUP_WARMUP_MODEL", "0") == "1"  # Also send one (billable) models.get to the model endpoint
+STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "30"))  # Seconds; after this the worker reports ready anyway
+
+# Modules that import google.genai or mcp (about a second together); nothing at module level in
+# main.py may import them, or /healthz waits for them again.
+CHAT_STACK = ("mcp_client_logic", "mcp_session_pool", "tool_catalogue")
+
+
+_chat_import: asyncio.Future | None = None  # The one import of the chat stack, shared by every caller
+
+
+async def chat_stack():
+    """The mcp_client_logic module, once the chat stack has been imported.
+
+    The import runs once, in a worker thread, so the event loop keeps serving while it
+    runs; a prompt that arrives during warm_up() awaits the same import.
+    """
+    global _chat_import
+    if _chat_import is None or (_chat_import.done() and not _chat_import.cancelled() and _chat_import.exception()):
+        _chat_import = asyncio.ensure_future(asyncio.to_thread(import_chat_stack))  # First call, or retry a failed import
+    await asyncio.shield(_chat_import)
+    return sys.modules["mcp_client_logic"]
+
+
+def loaded(name: str):
+    """A chat-stack module if it has been imported, else None (for metrics and shutdown)."""
+    return sys.modules.get(name)
+
+
+def import_chat_stack():
+    for name in CHAT_STACK:
+        importlib.import_module(name)
+
+
+async def open_connections(chat):
+    """One MCP session with its tool list and, with STARTUP_WARMUP_MODEL, one request to the model endpoint."""
+    async with chat.get_mcp_pool(chat.MCP_SERVER_URL).session() as mcp_session:
+        entry = await mcp_session.catalogue_entry()
+    log.info("MCP session open; %d tools catalogued.", len(entry.tool_names))
+    if STARTUP_WARMUP_MODEL and chat.GOOGLE_API_KEY:
+        try:
+            await chat.get_genai_client().aio.models.get(model=chat.GEMINI_MODEL)
+        except chat.genai.errors.APIError as e:
+            log.debug("Model warm-up request answered %s; its connection is open either way.", e.code)
+
+
+async def warm_up():
+    """Import the chat stack and start its clients, optionally open connections, then mark ready."""
+    started = time.perf_counter()
+    try:
+        chat = await chat_stack()
+        imported = time.perf_counter()
+        if chat.GOOGLE_API_KEY:
+            chat.init_genai_client()
+        await chat.get_mcp_pool(chat.MCP_SERVER_URL).start(warm=MCP_POOL_WARM)
+        if STARTUP_WARMUP:
+            try:
+                await asyncio.wait_for(open_connections(chat), STARTUP_WARMUP_TIMEOUT)
+            except Exception as e:
+                log.warning("Warm-up incomplete (%s); the first prompts will open connections instead.", str(e) or type(e).__name__)
+        log.info("Chat stack imported in %.2fs; ready after %.2fs.", imported - started, time.perf_counter() - started)
+    except Exception as e:
+        # Still report ready: /healthz and the page keep working, and each prompt retries what failed
+        log.exception("Startup warm-up failed after %.2fs: %s", time.perf_counter() - started, e)
+    lifecycle.mark_ready()
+
+
+async def shut_down():
+    """Close whatever warm_up() or the first prompts started."""
+    if _chat_import is not None and not _chat_import.done():
+        await asyncio.wait([_chat_import])  # Shutting down mid-import: let the import finish first
+    pool_module = loaded("mcp_session_pool")
+    if pool_module is not None:
+        await pool_module.close_all_pools()
+    chat = loaded("mcp_client_logic")
+    if chat is not None:
+        await chat.close_genai_client()
@@ -0,0 +1,150 @@
+# backend/static_assets.py
+# In-memory static asset serving: precompressed variants, strong ETags, Cache-Control and 304s.
+import gzip
+import hashlib
+import mimetypes
+import os
+import time
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app_logging import get_logger
+
+try:
+    import brotli  # Optional: br variants are only built when it is installed
+except ImportError:
+    brotli = None
+
+# --- Configuration ---
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "static"))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "300"))  # Seconds browsers may reuse /static/* without asking
+STATIC_RECHECK_INTERVAL = float(os.getenv("STATIC_RECHECK_INTERVAL", "1"))  # Seconds between mtime checks per asset
+STATIC_COMPRESS_MIN_BYTES = 512  # Smaller assets are served as they are
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+
+log = get_logger("static")
+
+
+class StaticAsset:
+    """One file held in memory with its identity, gzip and (if available) brotli encodings."""
+
+    def __init__(self, path: str, stat: os.stat_result, data: bytes):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.checked_at = time.monotonic()
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self.variants = {"identity": (data, f'"{digest}"')}  # encoding -> (body, strong ETag)
+        if len(data) >= STATIC_COMPRESS_MIN_BYTES and self.media_type.startswith(COMPRESSIBLE_TYPES):
+            encoded = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                encoded["br"] = brotli.compress(data, quality=11)
+            for encoding, body in encoded.items():
+                if len(body) < len(data):
+                    # Each encoding is a different representation, so it needs its own strong validator.
+                    self.variants[encoding] = (body, f'"{digest}-{encoding}"')
+
+    @property
+    def vary(self) -> bool:
+        return len(self.variants) > 1
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Content codings the client accepts (q > 0) from an Accept-Encoding header."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for it)."""
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+class StaticAssetCache:
+    """Serves the files under `directory` from memory.
+
+    load() reads and compresses everything up front. An asset is re-read when its mtime
+    or size changes, checked at most every `recheck_interval` seconds, so a busy page
+    costs a dictionary lookup rather than file I/O per request.
+    """
+
+    def __init__(self, directory: str = STATIC_DIR, recheck_interval: float = STATIC_RECHECK_INTERVAL):
+        self.directory = os.path.realpath(directory)
+        self.recheck_interval = recheck_interval
+        self._assets: dict[str, StaticAsset] = {}
+
+    def load(self) -> int:
+        """Read every file under the directory; returns how many were loaded."""
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                relative = os.path.relpath(os.path.join(dirpath, filename), self.directory).replace(os.sep, "/")
+                self.get(relative)
+        total = sum(len(body) for asset in self._assets.values() for body, _ in asset.variants.values())
+        log.info("Loaded %d static assets (%d bytes with compressed variants).", len(self._assets), total)
+        return len(self._assets)
+
+    def get(self, relative: str) -> StaticAsset | None:
+        asset = self._assets.get(relative)
+        now = time.monotonic()
+        if asset is not None and now - asset.checked_at < self.recheck_interval:
+            return asset
+        path = os.path.realpath(os.path.join(self.directory, relative))
+        if not path.startswith(self.directory + os.sep):
+            return None  # Outside the static directory, e.g. "../main.py"
+        try:
+            stat = os.stat(path)
+            if asset is not None and (stat.st_mtime_ns, stat.st_size) == (asset.mtime_ns, asset.size):
+                asset.checked_at = now
+                return asset
+            if not os.path.isfile(path):
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self._assets.pop(relative, None)
+            return None
+        if asset is not None:
+            log.info("Static asset %s changed on disk; reloaded.", relative)
+        asset = self._assets[relative] = StaticAsset(path, stat, data)
+        return asset
+
+    def response(self, request: Request, relative: str, cache_control: str) -> Response | None:
+        """The response for one asset (200 or 304; headers only for HEAD), or None if there is no such file."""
+        asset = self.get(relative)
+        if asset is None:
+            return None
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), "identity")
+        body, etag = asset.variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if asset.vary:
+            headers["Vary"] = "Accept-Encoding"
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))  # The length a GET would send
+            return Response(media_type=asset.media_type, headers=headers)
+        return Response(body, media_type=asset.media_type, headers=headers)
+
+
+static_assets = StaticAssetCache()
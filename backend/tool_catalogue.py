@@ -0,0 +1,181 @@
+# backend/tool_catalogue.py
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+
+import anyio
+import httpx
+from google.genai import types as genai_types
+from mcp import ClientSession, McpError, types as mcp_types
+
+from tool_result_cache import tool_result_cache
+from shared_store import call_store, get_store
+from chat_metrics import TOOL_SECONDS
+from app_logging import get_logger
+
+# --- Configuration ---
+MCP_TOOL_CACHE_TTL = float(os.getenv("MCP_TOOL_CACHE_TTL", "300"))
+MCP_TOOL_CACHE_SYNC = float(os.getenv("MCP_TOOL_CACHE_SYNC", "5"))  # Seconds between checks for invalidations by other workers
+
+log = get_logger("tools")
+
+
+@dataclass
+class CatalogueEntry:
+    list_tools_result: mcp_types.ListToolsResult
+    gemini_tools: list[genai_types.Tool]
+    fetched_at: float = field(default_factory=time.time)
+
+    @property
+    def tool_names(self) -> list[str]:
+        return [t.name for t in self.list_tools_result.tools]
+
+
+def mcp_tools_to_gemini_tools(tools: list[mcp_types.Tool]) -> list[genai_types.Tool]:
+    declarations = [
+        genai_types.FunctionDeclaration(
+            name=tool.name,
+            description=tool.description,
+            parameters_json_schema=tool.inputSchema,
+        )
+        for tool in tools
+    ]
+    return [genai_types.Tool(function_declarations=declarations)] if declarations else []
+
+
+class ToolCatalogue:
+    """Tool lists and their Gemini declarations, shared across requests and keyed by server URL.
+
+    Each worker keeps its decoded entries in process until they expire after `ttl`. The
+    shared store fills that cache, so a worker started after another one has fetched the
+    tools does not refetch them, and spreads invalidations: every `sync_interval` seconds
+    a cached entry's fetch time is checked against the one in the store.
+    """
+
+    def __init__(self, ttl: float = MCP_TOOL_CACHE_TTL, sync_interval: float = MCP_TOOL_CACHE_SYNC):
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._store = get_store("tool_catalogue", max_size=128)  # An entry and its fetch time per server
+        self._entries: dict[str, CatalogueEntry] = {}
+        self._synced_at: dict[str, float] = {}  # server URL -> time.monotonic() of the last store check
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def peek(self, server_url: str) -> CatalogueEntry | None:
+        entry = self._entries.get(server_url)
+        if entry is not None and time.time() < entry.fetched_at + self.ttl and await self._in_sync(server_url, entry):
+            return entry
+        self._entries.pop(server_url, None)
+        entry = await call_store(self._store, "get", server_url)  # Written by this worker or another one; decoded once here
+        if entry is not None:
+            self._keep(server_url, entry)
+        return entry
+
+    async def _in_sync(self, server_url: str, entry: CatalogueEntry) -> bool:
+        """False once the store holds a different entry, or none (another worker invalidated it)."""
+        if time.monotonic() - self._synced_at.get(server_url, 0.0) < self.sync_interval:
+            return True
+        self._synced_at[server_url] = time.monotonic()
+        return await call_store(self._store, "get", _fetched_at_key(server_url)) == entry.fetched_at
+
+    def _keep(self, server_url: str, entry: CatalogueEntry):
+        self._entries[server_url] = entry
+        self._synced_at[server_url] = time.monotonic()
+
+    async def get(self, server_url: str, fetch_list_tools) -> CatalogueEntry:
+        """Return the cached entry, calling `fetch_list_tools()` only when it is missing or expired."""
+        entry = await self.peek(server_url)
+        if entry is not None:
+            return entry
+        lock = self._locks.setdefault(server_url, asyncio.Lock())
+        async with lock:
+            # Another prompt may have refreshed the entry while we waited.
+            entry = await self.peek(server_url)
+            if entry is not None:
+                return entry
+            list_tools_result = await fetch_list_tools()
+            entry = CatalogueEntry(
+                list_tools_result=list_tools_result,
+                gemini_tools=mcp_tools_to_gemini_tools(list_tools_result.tools),
+            )
+            await call_store(self._store, "set", server_url, entry, self.ttl)
+            await call_store(self._store, "set", _fetched_at_key(server_url), entry.fetched_at, self.ttl)
+            self._keep(server_url, entry)
+            log.info("MCP tools available at %s: %s", server_url, entry.tool_names)
+            return entry
+
+    async def invalidate(self, server_url: str | None = None) -> list[str]:
+        if server_url is None:
+            self._entries, entries = {}, self._entries
+            cleared = await call_store(self._store, "clear")
+            return sorted(set(entries) | {key for key in cleared if isinstance(key, str)})
+        entry = self._entries.pop(server_url, None)
+        await call_store(self._store, "delete", _fetched_at_key(server_url))
+        deleted = await call_store(self._store, "delete", server_url)
+        return [server_url] if entry is not None or deleted else []
+
+
+def _fetched_at_key(server_url: str) -> tuple:
+    return (server_url, "fetched_at")
+
+
+tool_catalogue = ToolCatalogue()
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """True when a failed MCP request means the session itself is unusable (not just this call)."""
+    if isinstance(error, McpError):
+        return error.error.code == mcp_types.CONNECTION_CLOSED
+    return isinstance(error, (OSError, httpx.TransportError, anyio.ClosedResourceError,
+                              anyio.BrokenResourceError, anyio.EndOfStream))
+
+
+class CataloguedClientSession(ClientSession):
+    """ClientSession whose list_tools() is answered from the shared tool catalogue.
+
+    The Gemini SDK calls list_tools() on every generate call when handed an MCP
+    session, so routing it through the catalogue removes that round trip too.
+    call_tool() consults the opt-in client-side result cache for pure tools, and sets
+    transport_failed when a call fails because the connection did, so the session pool
+    discards this session instead of handing it to the next prompt.
+    """
+
+    def __init__(self, read_stream, write_stream, server_url: str, **kwargs):
+        kwargs.setdefault("message_handler", self._handle_message)
+        super().__init__(read_stream, write_stream, **kwargs)
+        self.server_url = server_url
+        self.transport_failed = False
+
+    async def list_tools(self, cursor: str | None = None) -> mcp_types.ListToolsResult:
+        if cursor is not None:
+            return await super().list_tools(cursor)
+        return (await self.catalogue_entry()).list_tools_result
+
+    async def catalogue_entry(self) -> CatalogueEntry:
+        """The cached tool list together with its Gemini function declarations."""
+        return await tool_catalogue.get(self.server_url, super().list_tools)
+
+    async def call_tool(self, name: str, arguments: dict | None = None, *args, **kwargs) -> mcp_types.CallToolResult:
+        started = time.perf_counter()
+        key = tool_result_cache.key(self.server_url, name, arguments)
+        if key is not None:
+            cached = await tool_result_cache.get(key)
+            if cached is not None:
+                TOOL_SECONDS.observe(time.perf_counter() - started, name, "true")
+                return cached
+        try:
+            result = await super().call_tool(name, arguments, *args, **kwargs)
+        except Exception as e:
+            if is_transport_error(e):
+                self.transport_failed = True
+            raise
+        TOOL_SECONDS.observe(time.perf_counter() - started, name, "false")
+        if key is not None and not result.isError:
+            await tool_result_cache.put(key, result)
+        return result
+
+    async def _handle_message(self, message):
+        if isinstance(message, mcp_types.ServerNotification) and \
+                isinstance(message.root, mcp_types.ToolListChangedNotification):
+            log.info("MCP server at %s reported a tool list change; invalidating cached tools.", self.server_url)
+            await tool_catalogue.invalidate(self.server_url)
@@ -0,0 +1,81 @@
+# backend/tool_executor.py
+import asyncio
+import os
+
+from fastapi import WebSocket
+from google.genai import types as genai_types
+from mcp import ClientSession
+
+from app_logging import get_logger
+from tool_catalogue import is_transport_error
+
+# --- Configuration ---
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "8"))  # Tool calls in flight per prompt
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "30"))  # Seconds before one tool call is abandoned
+
+log = get_logger("tools")
+
+
+def call_tool_result_to_response(result) -> dict:
+    """The function_response payload for an MCP CallToolResult, in the same shape the SDK's AFC used."""
+    payload = result.model_dump(mode="json", exclude_none=True)
+    return {"error": payload} if result.isError else {"result": payload}
+
+
+class ToolCallBatch:
+    """The function calls of one model turn, executed concurrently over one MCP session.
+
+    Each call starts as soon as it is submitted, at most `max_concurrency` run at once,
+    and its tool_response is sent to the WebSocket the moment it completes. responses()
+    returns the function_response parts in call order, ready for the next model request.
+    """
+
+    def __init__(self, session: ClientSession, websocket: WebSocket, send, semaphore: asyncio.Semaphore,
+                 timeout: float = TOOL_CALL_TIMEOUT):
+        self.session = session
+        self.websocket = websocket
+        self.send = send
+        self.semaphore = semaphore
+        self.timeout = timeout
+        self._calls: list[tuple[genai_types.FunctionCall, asyncio.Task]] = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def submit(self, function_call: genai_types.FunctionCall, call_id: str):
+        task = asyncio.create_task(self._run(function_call, call_id), name=f"tool:{function_call.name}")
+        self._calls.append((function_call, task))
+
+    async def _run(self, function_call: genai_types.FunctionCall, call_id: str) -> dict:
+        name = function_call.name
+        async with self.semaphore:
+            try:
+                result = await asyncio.wait_for(
+                    self.session.call_tool(name, dict(function_call.args or {})), timeout=self.timeout)
+                response = call_tool_result_to_response(result)
+            except asyncio.TimeoutError:
+                log.warning("Tool %s timed out after %.1fs.", name, self.timeout)
+                # A request lost with a dead transport is never answered either, so don't reuse the session
+                if hasattr(self.session, "transport_failed"):
+                    self.session.transport_failed = True
+                response = {"error": f"Tool call timed out after {self.timeout:g} seconds."}
+            except Exception as e:
+                if is_transport_error(e):
+                    raise  # The MCP connection failed: fail the prompt; the pool drops the session on release
+                # Otherwise the model gets to see the failure and decide what to do next
+                log.warning("Tool %s failed: %s", name, e)
+                response = {"error": str(e)}
+        await self.send(self.websocket, "tool_response", {"id": call_id, "name": name, "response": response})
+        return response
+
+    async def responses(self) -> list[genai_types.Part]:
+        results = await asyncio.gather(*(task for _, task in self._calls))
+        return [
+            genai_types.Part(function_response=genai_types.FunctionResponse(
+                id=function_call.id, name=function_call.name, response=response))
+            for (function_call, _), response in zip(self._calls, results)
+        ]
+
+    def cancel(self):
+        for _, task in self._calls:
+            task.cancel()
@@ -0,0 +1,64 @@
+# backend/tool_result_cache.py
+import json
+import os
+
+from shared_store import call_store, get_store
+
+# --- Configuration ---
+# Opt-in: answer repeated deterministic tool calls without a round trip to the MCP server.
+MCP_CLIENT_RESULT_CACHE = os.getenv("MCP_CLIENT_RESULT_CACHE", "0") == "1"
+MCP_CLIENT_RESULT_CACHE_SIZE = int(os.getenv("MCP_CLIENT_RESULT_CACHE_SIZE", "10000"))
+MCP_CLIENT_CACHE_TOOLS = frozenset(
+    name.strip() for name in
+    os.getenv("MCP_CLIENT_CACHE_TOOLS", "add,subtract,multiply,divide,evaluate").split(",")
+    if name.strip()
+)
+
+
+class ToolResultCache:
+    """Bounded LRU of CallToolResults for pure tools, keyed by server URL, tool name and arguments.
+
+    Entries live in the shared store, so with SHARED_STORE=manager://... every worker reuses them.
+    """
+
+    def __init__(self, max_size: int = MCP_CLIENT_RESULT_CACHE_SIZE, enabled: bool = MCP_CLIENT_RESULT_CACHE,
+                 cacheable_tools: frozenset = MCP_CLIENT_CACHE_TOOLS):
+        self.max_size = max_size
+        self.enabled = enabled
+        self.cacheable_tools = cacheable_tools
+        self.hits = 0
+        self.misses = 0
+        self._store = get_store("client_tool_results", max_size) if enabled else None
+
+    def key(self, server_url: str, name: str, arguments: dict | None):
+        if not self.enabled or name not in self.cacheable_tools:
+            return None
+        try:
+            return (server_url, name, json.dumps(arguments or {}, sort_keys=True))
+        except (TypeError, ValueError):
+            return None
+
+    async def get(self, key):
+        result = await call_store(self._store, "get", key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    async def put(self, key, result):
+        await call_store(self._store, "set", key, result)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": self._store.size() if self._store is not None else 0,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+tool_result_cache = ToolResultCache()
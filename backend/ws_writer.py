@@ -0,0 +1,183 @@
+# backend/ws_writer.py
+import asyncio
+import collections
+import json
+import os
+import time
+from contextvars import ContextVar
+
+from fastapi import WebSocket
+
+from chat_metrics import WS_SEND_SECONDS
+from app_logging import add_log_context, get_logger
+
+try:
+    import orjson  # Optional: several times faster than json.dumps for our small payloads
+
+    def dumps(payload) -> str:
+        return orjson.dumps(payload).decode()
+except ImportError:
+    def dumps(payload) -> str:
+        return json.dumps(payload)
+
+# --- Configuration ---
+WS_OUTBOX_SIZE = int(os.getenv("WS_OUTBOX_SIZE", "256"))
+WS_COALESCE_WINDOW = float(os.getenv("WS_COALESCE_WINDOW", "0.015"))  # Seconds a lone text frame waits for more text
+WS_COALESCE_MAX_CHARS = int(os.getenv("WS_COALESCE_MAX_CHARS", "4096"))
+
+MERGEABLE_TYPES = {"text_chunk": "", "thought": "\n\n"}  # Event type -> separator used when merging
+
+log = get_logger("ws")
+
+
+class WebSocketWriter:
+    """Per-connection outbound queue that owns all sends on its WebSocket.
+
+    Producers enqueue event dicts and only wait when the queue is full, so a slow
+    client applies bounded backpressure instead of stalling every chunk. Adjacent
+    text_chunk/thought events of the same request are merged (up to
+    WS_COALESCE_MAX_CHARS), and a pending usage_chunk is replaced by a newer one.
+    """
+
+    def __init__(self, websocket, max_queue: int = WS_OUTBOX_SIZE,
+                 coalesce_window: float = WS_COALESCE_WINDOW,
+                 coalesce_max_chars: int = WS_COALESCE_MAX_CHARS):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_chars = coalesce_max_chars
+        self._pending: collections.deque[tuple[dict, float]] = collections.deque()
+        self._cond = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self.events_in = 0
+        self.frames_out = 0
+        self.send_latencies: collections.deque[float] = collections.deque(maxlen=4096)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain(), name="websocket-writer")
+        return self
+
+    async def send(self, payload: dict):
+        async with self._cond:
+            while len(self._pending) >= self.max_queue and not self._closed:
+                await self._cond.wait()
+            if self._closed:
+                return
+            self.events_in += 1
+            if not self._merge(payload):
+                self._pending.append((payload, time.perf_counter()))
+            self._cond.notify_all()
+
+    def _merge(self, payload: dict) -> bool:
+        message_type = payload.get("type")
+        if message_type == "usage_chunk":
+            # Usage counters are cumulative, so only the newest one matters.
+            for pending, _ in self._pending:
+                if pending.get("type") == "usage_chunk" and pending.get("request_id") == payload.get("request_id"):
+                    pending["content"] = payload["content"]
+                    return True
+            return False
+        if message_type not in MERGEABLE_TYPES or not self._pending:
+            return False
+        tail, _ = self._pending[-1]
+        if (tail.get("type") != message_type or tail.get("request_id") != payload.get("request_id")
+                or tail.get("details") != payload.get("details")
+                or not isinstance(tail.get("content"), str) or not isinstance(payload.get("content"), str)
+                or len(tail["content"]) + len(payload["content"]) > self.coalesce_max_chars):
+            return False
+        tail["content"] = tail["content"] + MERGEABLE_TYPES[message_type] + payload["content"]
+        return True
+
+    async def _drain(self):
+        while True:
+            async with self._cond:
+                while not self._pending and not self._closed:
+                    await self._cond.wait()
+                if not self._pending:
+                    return
+                head_type = self._pending[0][0].get("type")
+                lone_text = len(self._pending) == 1 and head_type in MERGEABLE_TYPES and not self._closed
+            if lone_text and self.coalesce_window > 0:
+                # Give the model stream a moment to add to this frame before sending it.
+                await asyncio.sleep(self.coalesce_window)
+            async with self._cond:
+                if not self._pending:
+                    continue  # Cleared by close(flush=False) during the coalescing sleep
+                payload, enqueued_at = self._pending.popleft()
+                self._cond.notify_all()
+            await self._write(payload)
+            self.send_latencies.append(time.perf_counter() - enqueued_at)
+
+    async def _write(self, payload: dict):
+        try:
+            text = dumps(payload)
+        except TypeError as te:
+            log.error("Serialization error for WebSocket message: %s. Payload: %r", te, payload)
+            text = dumps({"type": "error", "content": "Server serialization error during message preparation."})
+        try:
+            started = time.perf_counter()
+            await self.websocket.send_text(text)
+            WS_SEND_SECONDS.observe(time.perf_counter() - started)
+            self.frames_out += 1
+        except Exception as e:
+            log.warning("Error sending WebSocket message: %s", e)
+
+    async def close(self, flush: bool = True, timeout: float = 5.0):
+        """Stop accepting events; with flush, deliver what is queued before returning."""
+        async with self._cond:
+            self._closed = True
+            if not flush:
+                self._pending.clear()
+            self._cond.notify_all()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            except Exception as e:
+                log.warning("WebSocket writer failed: %s", e)
+
+
+def attach_outbox(websocket) -> WebSocketWriter:
+    writer = WebSocketWriter(websocket).start()
+    websocket.state.outbox = writer
+    return writer
+
+
+def get_outbox(websocket) -> WebSocketWriter | None:
+    state = getattr(websocket, "state", None)
+    return getattr(state, "outbox", None) if state is not None else None
+
+
+# Set by each generation task so every event it sends is tagged with the prompt it belongs to.
+current_request_id: ContextVar[str | None] = ContextVar("current_request_id", default=None)
+add_log_context("request_id", current_request_id.get)
+
+
+async def send_websocket_message(websocket: WebSocket, message_type: str, content: any, details: dict = None, request_id: str = None):
+    payload = {"type": message_type, "content": content}
+    if details:
+        payload["details"] = details
+    if request_id is None:
+        request_id = current_request_id.get()
+    if request_id is not None:
+        payload["request_id"] = request_id
+    # Connections served by main.py have an outbound writer that queues, coalesces and sends for us
+    outbox = get_outbox(websocket)
+    if outbox is not None:
+        await outbox.send(payload)
+        return
+    try:
+        json_payload = dumps(payload)
+        await websocket.send_text(json_payload)
+    except TypeError as te:
+        log.error("Serialization error for WebSocket message: %s. Payload: %r", te, payload)
+        try:
+            error_payload_fallback = dumps({"type": "error", "content": "Server serialization error during message preparation."})
+            await websocket.send_text(error_payload_fallback)
+        except Exception as fallback_e:
+            log.warning("Failed to send even fallback error message: %s", fallback_e)
+    except Exception as e:
+        log.warning("Error sending WebSocket message: %s", e)
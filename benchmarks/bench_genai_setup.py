@@ -0,0 +1,99 @@
+# benchmarks/bench_genai_setup.py
+"""Per-request Gemini setup overhead: client-per-message vs. the shared client.
+
+Runs offline against benchmarks/fake_gemini_server.py.
+
+  python benchmarks/bench_genai_setup.py --requests 300 --concurrency 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini_server import FakeGeminiServer
+
+
+async def run_stream(client, config, model):
+    stream = await client.aio.models.generate_content_stream(model=model, contents="What is 6 * 7?", config=config)
+    async for _ in stream:
+        pass
+
+
+async def per_request_client(base_url, model):
+    # The old path: a fresh client, config, ThinkingConfig and instruction string for every message.
+    from google import genai
+    from google.genai import types as genai_types
+    import mcp_client_logic
+    client = genai.Client(api_key="bench-key", http_options=genai_types.HttpOptions(base_url=base_url))
+    config = genai_types.GenerateContentConfig(
+        system_instruction=mcp_client_logic.SYSTEM_INSTRUCTION_TEXT,
+        thinking_config=genai_types.ThinkingConfig(include_thoughts=True, thinking_budget=-1),
+    )
+    try:
+        await run_stream(client, config, model)
+    finally:
+        aclose = getattr(client.aio, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def shared_client(model):
+    import mcp_client_logic
+    await run_stream(mcp_client_logic.get_genai_client(), mcp_client_logic.build_chat_config([]), model)
+
+
+async def measure(label, make_call, requests, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await make_call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<22} mean {statistics.mean(latencies) * 1000:7.2f} ms   "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms   "
+          f"{requests / wall:8.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    with FakeGeminiServer() as server:
+        os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+        os.environ["GEMINI_BASE_URL"] = server.base_url
+        import mcp_client_logic
+        model = mcp_client_logic.GEMINI_MODEL
+
+        async def run():
+            print(f"Fake model endpoint: {server.base_url}  ({args.requests} requests, concurrency {args.concurrency})")
+            before_conns = server.connections
+            await measure("client per message", lambda: per_request_client(server.base_url, model), args.requests, args.concurrency)
+            print(f"{'':<22} TCP connections opened: {server.connections - before_conns}")
+
+            mcp_client_logic.init_genai_client()
+            before_conns = server.connections
+            await measure("shared client", lambda: shared_client(model), args.requests, args.concurrency)
+            print(f"{'':<22} TCP connections opened: {server.connections - before_conns}")
+            await mcp_client_logic.close_genai_client()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/bench_snapshot.py
+"""Throughput and peak memory of `ss.py fm` on a synthetic source tree.
+
+Builds a tree of small source files with a few large text and binary files mixed in,
+then snapshots it in a fresh process per run (so peak RSS belongs to that run alone)
+with several worker counts, and checks every run produced identical output.
+--reference compares another copy of ss.py, e.g. the version before a change (its
+output may differ if it walked directories in filesystem order rather than sorted):
+
+  python benchmarks/bench_snapshot.py --files 20000 --workers 1 4 16
+  git show HEAD~1:ss.py > /tmp/ss_before.py
+  python benchmarks/bench_snapshot.py --reference /tmp/ss_before.py
+
+--duplicates copies that fraction of the small files into a vendored/ subtree, and
+--modes compares output formats (reported with their size; the output digests differ):
+
+  python benchmarks/bench_snapshot.py --duplicates 0.5 --workers 8 --modes plain gzip dedup gzip+dedup
+"""
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTENSIONS = (".py", ".js", ".ts", ".md", ".json", ".css", ".html", ".go", ".rs", ".txt", ".yaml", ".sh")
+
+
+def build_tree(root: str, files: int, large_files: int, large_mb: float, duplicates: float = 0.0, seed: int = 7) -> int:
+    """Write the synthetic tree; returns its size in bytes."""
+    rng = random.Random(seed)
+    line = "    value = compute(alpha, beta)  # résumé of the arithmetic so far\n"
+    total = 0
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i % 50:02d}", f"mod{i % 13:02d}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{i:06d}{EXTENSIONS[i % len(EXTENSIONS)]}")
+        if i % 97 == 0:
+            data = bytes(rng.getrandbits(8) for _ in range(2048))  # Binary: ends up as a Note block
+        else:
+            data = (line * rng.randint(5, 200)).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(data)
+        total += len(data)
+    large_dir = os.path.join(root, "assets")
+    os.makedirs(large_dir, exist_ok=True)
+    for i in range(large_files):
+        size = int(large_mb * 2**20)
+        path = os.path.join(large_dir, f"large{i}.txt" if i % 2 == 0 else f"large{i}.bin")
+        block = (line * 1000).encode("utf-8")
+        with open(path, "wb") as f:
+            for _ in range(size // len(block)):
+                f.write(block if i % 2 == 0 else os.urandom(len(block)))
+        total += size // len(block) * len(block)
+    sources = [os.path.join(d, f) for d, _, fs in os.walk(root) if "assets" not in d for f in fs]
+    for source in sorted(sources)[:int(len(sources) * duplicates)]:
+        # Vendored copies: same bytes under another path, as in node_modules or third_party trees.
+        target = os.path.join(root, "vendored", os.path.relpath(source, root))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+        total += os.path.getsize(target)
+    return total
+
+
+def peak_rss_kb() -> int:
+    # VmHWM starts afresh at exec; ru_maxrss would include the parent's peak on Linux.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_child(args):
+    """One measured snapshot in this (fresh) process; prints a JSON result line."""
+    spec = importlib.util.spec_from_file_location("ss_under_test", args.child_module)
+    ss = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ss)
+    kwargs = json.loads(args.child_options or "{}")
+    if args.child_workers:
+        kwargs["workers"] = args.child_workers
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        ok, processed, _, errors = ss.create_codebase_snapshot(args.child_tree, args.child_output, **kwargs)
+    seconds = time.perf_counter() - started
+    print(json.dumps({"ok": ok, "files": processed, "errors": len(errors), "seconds": seconds, "peak_rss_kb": peak_rss_kb()}))
+
+
+MODES = {  # --modes name -> (output suffix, create_codebase_snapshot options)
+    "plain": (".md", {}),
+    "gzip": (".md.gz", {"compression": "gzip"}),
+    "zstd": (".md.zst", {"compression": "zstd"}),
+    "dedup": (".md", {"dedup": True}),
+    "gzip+dedup": (".md.gz", {"compression": "gzip", "dedup": True}),
+    "zstd+dedup": (".md.zst", {"compression": "zstd", "dedup": True}),
+}
+
+
+def measure(module: str, tree: str, output: str, workers: int | None, options: dict | None = None) -> dict:
+    command = [sys.executable, __file__, "--child-module", module, "--child-tree", tree, "--child-output", output]
+    if workers:
+        command += ["--child-workers", str(workers)]
+    if options:
+        command += ["--child-options", json.dumps(options)]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000, help="small source files in the tree")
+    parser.add_argument("--large-files", type=int, default=4, help="large files (half text, half binary)")
+    parser.add_argument("--large-mb", type=float, default=64, help="size of each large file in MiB")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="worker counts to measure")
+    parser.add_argument("--reference", help="another ss.py to measure first, e.g. the previous version")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration; the fastest is reported")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of small files also copied under vendored/")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["plain"], help="output formats to measure")
+    parser.add_argument("--keep", help="build the tree here and keep it (reused if it exists)")
+    parser.add_argument("--child-module", help=argparse.SUPPRESS)
+    parser.add_argument("--child-tree", help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    parser.add_argument("--child-workers", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child_module:
+        run_child(args)
+        return
+
+    work = args.keep or tempfile.mkdtemp(prefix="bench_snapshot_")
+    tree = os.path.join(work, "tree")
+    try:
+        if not os.path.isdir(tree):
+            print(f"Building {args.files} files + {args.large_files} x {args.large_mb:g} MiB in {tree} ...")
+            build_tree(tree, args.files, args.large_files, args.large_mb, args.duplicates)
+        tree_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(tree) for f in fs) / 2**20
+
+        configs = [("reference", args.reference, None, "plain")] if args.reference else []
+        for mode in args.modes:
+            prefix = f"{mode} " if args.modes != ["plain"] else ""
+            configs += [(f"{prefix}workers={n}", os.path.join(ROOT, "ss.py"), n, mode) for n in args.workers]
+        measure(configs[0][1], tree, os.path.join(work, "warm.md"), configs[0][2])  # Warm the page cache
+
+        print(f"tree: {tree_mb:.1f} MiB")
+        print(f"{'configuration':<24} {'seconds':>8} {'MiB/s':>8} {'files/s':>9} {'peak RSS':>10} {'size':>10}  output")
+        for name, module, workers, mode in configs:
+            suffix, options = MODES[mode]
+            output = os.path.join(work, name.replace(" ", "_") + suffix)
+            best = min((measure(module, tree, output, workers, options) for _ in range(args.repeat)), key=lambda r: r["seconds"])
+            print(f"{name:<24} {best['seconds']:8.2f} {tree_mb / best['seconds']:8.1f} "
+                  f"{best['files'] / best['seconds']:9.0f} {best['peak_rss_kb'] / 1024:8.1f} MB "
+                  f"{os.path.getsize(output) / 2**20:7.1f} MiB  {digest(output)}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
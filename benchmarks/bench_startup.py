@@ -0,0 +1,201 @@
+# benchmarks/bench_startup.py
+"""Startup time of the backend and the MCP server, from process start to healthy.
+
+Each run starts a fresh uvicorn process and polls it, reporting the time until /healthz
+first answers (the port is open), until /readyz turns 200, and, for the backend, until
+a first prompt has been answered end to end. The backend talks to a scripted fake
+Gemini (benchmarks/fake_gemini_server.py) and to an MCP server started from the same
+tree. --reference measures another checkout first, e.g. the version before a change:
+
+  python benchmarks/bench_startup.py --repeat 5
+  git worktree add /tmp/before HEAD~1
+  python benchmarks/bench_startup.py --reference /tmp/before
+
+--imports prints an import-time profile instead (python -X importtime): what importing
+backend/main.py and mcp/calculater_mcp.py costs, by direct import and by module:
+
+  python benchmarks/bench_startup.py --imports --top 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import websockets
+
+from fake_gemini_server import CalculatorScript, FakeGeminiServer, _free_port
+
+PROMPT = "What is 12 plus 30?"
+POLL_INTERVAL = 0.02
+START_TIMEOUT = 60.0
+
+
+def status(url: str) -> int | None:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None  # Not listening yet
+
+
+def spawn(command: list[str], cwd: str, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(command, cwd=cwd, env={**os.environ, **env},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_for(process: subprocess.Popen, base: str, started: float) -> dict:
+    """Seconds from `started` until /healthz answers and until /readyz is 200."""
+    times = {}
+    deadline = started + START_TIMEOUT
+    while "ready" not in times:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"no readiness within {START_TIMEOUT:g}s")
+        if "healthy" not in times and status(base + "/healthz") == 200:
+            times["healthy"] = time.perf_counter() - started
+        if "healthy" in times and status(base + "/readyz") == 200:
+            times["ready"] = time.perf_counter() - started
+        time.sleep(POLL_INTERVAL)
+    return times
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def start_mcp_server(tree: str, port: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "calculater_mcp:create_app", "--factory",
+               "--port", str(port), "--no-access-log", "--log-level", "warning"]
+    return spawn(command, os.path.join(tree, "mcp"), {"LOG_LEVEL": "WARNING", "FASTMCP_LOG_LEVEL": "WARNING"})
+
+
+def measure_mcp(tree: str) -> dict:
+    port = _free_port()
+    started = time.perf_counter()
+    process = start_mcp_server(tree, port)
+    try:
+        return wait_for(process, f"http://127.0.0.1:{port}", started)
+    finally:
+        stop(process)
+
+
+async def first_answer(url: str) -> None:
+    async with websockets.connect(url) as ws:
+        await ws.send(json.dumps({"message": PROMPT}))
+        while True:
+            message = json.loads(await ws.recv())
+            if message["type"] == "error":
+                raise RuntimeError(f"prompt failed: {message['content']}")
+            if message["type"] == "stream_end":
+                return
+
+
+def measure_backend(tree: str, fake: FakeGeminiServer, mcp_url: str, env: dict) -> dict:
+    port = _free_port()
+    started = time.perf_counter()
+    process = spawn([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--no-access-log", "--log-level", "warning"],
+                    os.path.join(tree, "backend"),
+                    {"GEMINI_API_KEY": "fake", "GEMINI_BASE_URL": fake.base_url, "MCP_SERVER_URL": mcp_url,
+                     "ARITHMETIC_FAST_PATH": "0", "LOG_LEVEL": "WARNING", **env})
+    try:
+        times = wait_for(process, f"http://127.0.0.1:{port}", started)
+        asked = time.perf_counter()
+        asyncio.run(first_answer(f"ws://127.0.0.1:{port}/ws/chat"))
+        times["first_prompt"] = time.perf_counter() - asked
+        times["answered"] = time.perf_counter() - started
+        return times
+    finally:
+        stop(process)
+
+
+def summarize(runs: list[dict]) -> dict:
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def import_profile(tree: str, directory: str, module: str, top: int):
+    """Print `python -X importtime -c "import <module>"`, condensed."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.join(tree, directory), capture_output=True, text=True,
+                            env={**os.environ, "LOG_LEVEL": "WARNING"})
+    rows = []  # (self us, cumulative us, depth, name)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    index = next(i for i, row in enumerate(rows) if row[3] == module)
+    target = rows[index]
+    # A module's own imports are listed just before it, one level deeper
+    children = []
+    while index > 0 and rows[index - 1][2] > target[2]:
+        index -= 1
+        children.append(rows[index])
+    direct = sorted((row for row in children if row[2] == target[2] + 1), key=lambda row: -row[1])
+    print(f"import {module} ({directory}/): {target[1] / 1e6:.3f}s, {len(rows)} modules")
+    print(f"  {'direct import':<40} {'cumulative':>10}")
+    for _, cumulative_us, _, name in direct[:top]:
+        print(f"  {name:<40} {cumulative_us / 1e6:9.3f}s")
+    print(f"  {'module (own time)':<40} {'self':>10}")
+    for self_us, _, _, name in sorted(children + [target], key=lambda row: -row[0])[:top]:
+        print(f"  {name:<40} {self_us / 1e6:9.3f}s")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="starts per configuration; medians are reported")
+    parser.add_argument("--reference", help="another checkout of this repository to measure first")
+    parser.add_argument("--backend-env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the backend, e.g. STARTUP_WARMUP=1 (repeatable)")
+    parser.add_argument("--imports", action="store_true", help="print an import-time profile instead")
+    parser.add_argument("--top", type=int, default=12, help="rows per --imports table")
+    args = parser.parse_args()
+
+    trees = [("reference", os.path.abspath(args.reference))] if args.reference else []
+    trees.append(("current", ROOT))
+    if args.imports:
+        for name, tree in trees:
+            print(f"== {name}: {tree}")
+            import_profile(tree, "backend", "main", args.top)
+            import_profile(tree, "mcp", "calculater_mcp", args.top)
+        return
+
+    backend_env = dict(item.split("=", 1) for item in args.backend_env)
+    fake = FakeGeminiServer(script=CalculatorScript()).start()
+    mcp_port = _free_port()
+    mcp_server = start_mcp_server(ROOT, mcp_port)
+    try:
+        wait_for(mcp_server, f"http://127.0.0.1:{mcp_port}", time.perf_counter())
+        mcp_url = f"http://127.0.0.1:{mcp_port}/mcp"
+        print(f"{'configuration':<20} {'healthy':>9} {'ready':>9} {'1st prompt':>11} {'answered':>9}  (seconds from process start, median of {args.repeat})")
+        for name, tree in trees:
+            mcp = summarize([measure_mcp(tree) for _ in range(args.repeat)])
+            print(f"{name + ' mcp':<20} {mcp['healthy']:9.3f} {mcp['ready']:9.3f}")
+            backend = summarize([measure_backend(tree, fake, mcp_url, backend_env) for _ in range(args.repeat)])
+            print(f"{name + ' backend':<20} {backend['healthy']:9.3f} {backend['ready']:9.3f} "
+                  f"{backend['first_prompt']:11.3f} {backend['answered']:9.3f}")
+    finally:
+        stop(mcp_server)
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_ws_writer.py
+"""Frames per response and send latency: direct per-event sends vs. the coalescing outbound writer.
+
+A simulated model stream emits thoughts, text chunks and usage updates to a fake
+WebSocket whose send_text costs a fixed delay (a slow client).
+
+  python benchmarks/bench_ws_writer.py --chunks 400 --chunk-interval 0.001 --send-delay 0.002
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from ws_writer import WebSocketWriter, dumps
+
+
+class SlowWebSocket:
+    def __init__(self, send_delay: float):
+        self.send_delay = send_delay
+        self.frames = 0
+
+    async def send_text(self, text: str):
+        self.frames += 1
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+
+
+def model_events(chunks: int):
+    yield {"type": "thought", "content": "Weighing the operands."}
+    yield {"type": "thought", "content": "Choosing the tool."}
+    for i in range(chunks):
+        yield {"type": "text_chunk", "content": f"word{i} "}
+        if i % 10 == 0:
+            yield {"type": "usage_chunk", "content": {"output_tokens": i + 1}}
+    yield {"type": "stream_end", "content": "Calculation complete."}
+
+
+async def run_direct(args):
+    ws = SlowWebSocket(args.send_delay)
+    latencies = []
+    start = time.perf_counter()
+    for event in model_events(args.chunks):
+        t0 = time.perf_counter()
+        await ws.send_text(dumps(event))
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(args.chunk_interval)
+    producer = time.perf_counter() - start
+    return ws.frames, latencies, producer, time.perf_counter() - start
+
+
+async def run_writer(args):
+    ws = SlowWebSocket(args.send_delay)
+    writer = WebSocketWriter(ws).start()
+    start = time.perf_counter()
+    for event in model_events(args.chunks):
+        await writer.send(dict(event))
+        await asyncio.sleep(args.chunk_interval)
+    producer = time.perf_counter() - start
+    await writer.close()
+    return ws.frames, list(writer.send_latencies), producer, time.perf_counter() - start
+
+
+def report(label, frames, latencies, producer, total, events):
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<18} events {events:5d}  frames {frames:5d}  "
+          f"send latency p50 {statistics.median(latencies) * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms  "
+          f"model stream {producer * 1000:7.1f} ms  delivered {total * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=400, help="text chunks per response")
+    parser.add_argument("--chunk-interval", type=float, default=0.001, help="seconds between model chunks")
+    parser.add_argument("--send-delay", type=float, default=0.002, help="seconds each send_text takes (client speed)")
+    args = parser.parse_args()
+
+    events = sum(1 for _ in model_events(args.chunks))
+    print(f"{args.chunks} chunks every {args.chunk_interval * 1000:.1f} ms, {args.send_delay * 1000:.1f} ms per send")
+    report("direct sends", *asyncio.run(run_direct(args)), events)
+    report("coalescing writer", *asyncio.run(run_writer(args)), events)
+    print("Send latency is send_text time for direct sends and enqueue-to-sent time for the writer;")
+    print("'model stream' is how long the producer took, i.e. how much the client slowed the model stream.")
+
+
+if __name__ == "__main__":
+    main()
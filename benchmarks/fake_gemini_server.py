@@ -0,0 +1,182 @@
+# benchmarks/fake_gemini_server.py
+"""Local stand-in for the Gemini streamGenerateContent endpoint.
+
+Point the backend (or a genai.Client) at it with GEMINI_BASE_URL / HttpOptions(base_url=...).
+Every request streams a few SSE chunks; no API key or network access is needed.
+"""
+import asyncio
+import json
+import re
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+def make_chunk(parts, usage=None):
+    chunk = {"candidates": [{"content": {"role": "model", "parts": parts}}]}
+    if usage:
+        chunk["usageMetadata"] = usage
+    return chunk
+
+
+def default_script(request_body):
+    return [
+        make_chunk([{"text": "Considering the question.", "thought": True}]),
+        make_chunk([{"text": "The answer, "}]),
+        make_chunk([{"text": "with a sigh, is 42."}], usage={"candidatesTokenCount": 8, "thoughtsTokenCount": 4}),
+    ]
+
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_OPERATION_WORDS = (
+    ("plus", "add"), ("add", "add"), ("sum", "add"),
+    ("minus", "subtract"), ("subtract", "subtract"),
+    ("times", "multiply"), ("multiply", "multiply"), ("product", "multiply"),
+    ("divide", "divide"), ("over", "divide"),
+)
+
+
+class CalculatorScript:
+    """Scripted model that calls calculator tools before answering, like Calculon does.
+
+    Stateful per turn: the request's contents say how far the turn has got. While
+    fewer than `tool_rounds` function responses follow the latest user prompt, the
+    reply is `thoughts` thought chunks and then a functionCall for the operation named
+    in the prompt (the SDK only runs a call that ends the stream); `parallel_calls`
+    independent calls per round go out together in that last chunk. After that it
+    streams `text_chunks` chunks of answer text quoting the last tool result.
+    """
+
+    def __init__(self, thoughts: int = 2, text_chunks: int = 8, tool_rounds: int = 1, parallel_calls: int = 1):
+        self.thoughts = thoughts
+        self.text_chunks = text_chunks
+        self.tool_rounds = tool_rounds
+        self.parallel_calls = max(1, parallel_calls)
+
+    def __call__(self, request_body):
+        contents = request_body.get("contents", [])
+        prompt_index = max((i for i, c in enumerate(contents)
+                            if c.get("role") == "user" and any("text" in p for p in c.get("parts", []))), default=0)
+        responses = [p["functionResponse"] for c in contents[prompt_index + 1:]
+                     for p in c.get("parts", []) if "functionResponse" in p]
+        prompt = " ".join(p.get("text", "") for p in contents[prompt_index].get("parts", [])) if contents else ""
+
+        chunks = [make_chunk([{"text": f"Thinking step {i + 1} about: {prompt[:40]}", "thought": True}])
+                  for i in range(self.thoughts)]
+        if len(responses) < self.tool_rounds * self.parallel_calls:
+            calls = [self.function_call(prompt, responses, offset) for offset in range(self.parallel_calls)]
+            chunks.append(make_chunk([{"functionCall": call} for call in calls]))
+            return chunks
+
+        result = json.dumps(responses[-1].get("response")) if responses else "nothing"
+        words = f"*Sigh.* Fine. The tools say {result}. Do try to keep up.".split(" ")
+        per_chunk = max(1, -(-len(words) // max(1, self.text_chunks)))
+        for start in range(0, len(words), per_chunk):
+            chunks.append(make_chunk([{"text": " ".join(words[start:start + per_chunk]) + " "}]))
+        output_tokens = len(words) + 2 * self.thoughts
+        chunks[-1]["usageMetadata"] = {"promptTokenCount": 100 + len(contents) * 20,
+                                       "candidatesTokenCount": output_tokens, "thoughtsTokenCount": 10 * self.thoughts}
+        return chunks
+
+    @staticmethod
+    def function_call(prompt: str, responses: list, offset: int = 0) -> dict:
+        lowered = prompt.lower()
+        name = next((tool for word, tool in _OPERATION_WORDS if word in lowered), "add")
+        numbers = [float(n) for n in _NUMBER_RE.findall(prompt)] or [6.0, 7.0]
+        a, b = numbers[0], numbers[1] if len(numbers) > 1 else 7.0
+        if responses:  # Later rounds build on the previous result, like a multi-step calculation
+            a = len(responses) + a
+        b += offset  # Calls made in parallel are independent of each other
+        if name == "divide":
+            return {"name": name, "args": {"numerator": a, "denominator": b or 1.0}}
+        return {"name": name, "args": {"a": a, "b": b}}
+
+
+class FakeGeminiServer:
+    """Runs the fake endpoint with uvicorn on a background thread.
+
+    `script(request_body)` returns the list of response chunks for one request.
+    `first_chunk_delay` mimics the model's time to first token and `chunk_delay`
+    spaces the remaining chunks out. `connections` counts the distinct client
+    sockets seen, i.e. how many TCP connections clients opened.
+    """
+
+    def __init__(self, script=default_script, chunk_delay: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 first_chunk_delay: float = 0.0):
+        self.script = script
+        self.chunk_delay = chunk_delay
+        self.first_chunk_delay = first_chunk_delay
+        self.host = host
+        self.port = port or _free_port()
+        self.requests = 0
+        self._peers = set()
+        self._server = None
+        self._thread = None
+        self.app = self._build_app()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def connections(self) -> int:
+        return len(self._peers)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/{api_version}/models/{model_action}")
+        async def generate(api_version: str, model_action: str, request: Request):
+            self.requests += 1
+            if request.client:
+                self._peers.add((request.client.host, request.client.port))
+            body = await request.json()
+            chunks = self.script(body)
+
+            if not model_action.endswith(":streamGenerateContent"):
+                merged_parts = [p for c in chunks for p in c["candidates"][0]["content"]["parts"]]
+                return make_chunk(merged_parts)
+
+            async def sse():
+                for i, chunk in enumerate(chunks):
+                    delay = self.first_chunk_delay if i == 0 else self.chunk_delay
+                    if delay:
+                        await asyncio.sleep(delay)
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+            return StreamingResponse(sse(), media_type="text/event-stream")
+
+        return app
+
+    def start(self):
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake Gemini server did not start.")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
@@ -0,0 +1,280 @@
+# benchmarks/load_test.py
+"""Load test for /ws/chat: many concurrent clients against the real backend, offline.
+
+The backend runs as a uvicorn subprocess (so its memory can be measured on its own)
+pointed at a scripted fake Gemini (benchmarks/fake_gemini_server.py) and at the real
+FastMCP calculator server from mcp/calculater_mcp.py, which runs in this process.
+Every prompt goes model -> tool call(s) -> model -> answer unless --fast-path is given.
+
+Reports prompts/sec, TTFT (prompt sent -> first thought or text chunk), end-to-end
+(prompt sent -> stream_end) percentiles and backend RSS per connection.
+
+  python benchmarks/load_test.py --clients 50 --prompts 10
+  python benchmarks/load_test.py --clients 200 --prompts 5 --chunk-delay 0.02 --json results.json
+  python benchmarks/load_test.py --baseline results.json   # exit 1 on a regression beyond --tolerance
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "mcp"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("FASTMCP_LOG_LEVEL", "WARNING")  # FastMCP logs every request at INFO
+
+import uvicorn
+import websockets
+
+from fake_gemini_server import CalculatorScript, FakeGeminiServer, _free_port
+
+PROMPTS = (
+    "What is 12 plus 30?",
+    "Multiply 7 by 6, if you can be bothered.",
+    "Please divide 84 by 2.",
+    "What's 100 minus 58?",
+)
+
+
+class InProcessMcpServer:
+    """The real FastMCP calculator app, served by uvicorn on a background thread."""
+
+    def __init__(self, port: int = 0):
+        self.port = port or _free_port()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/mcp"
+
+    def start(self):
+        import calculater_mcp
+        config = uvicorn.Config(calculater_mcp.create_app(), host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("MCP server did not start.")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+
+def rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout.strip()
+    return int(out) * 1024 if out else 0
+
+
+def start_backend(args, fake: FakeGeminiServer, mcp_server: InProcessMcpServer) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ,
+               GEMINI_API_KEY="bench-key", GEMINI_BASE_URL=fake.base_url, MCP_SERVER_URL=mcp_server.url,
+               ARITHMETIC_FAST_PATH="1" if args.fast_path else "0", LOG_LEVEL="WARNING",
+               MAX_GENERATIONS_PER_PROCESS=str(max(64, args.clients)),
+               # Every simulated client shares 127.0.0.1, so per-client rate limits stay off unless asked for.
+               CLIENT_PROMPT_RATE="0", CLIENT_CONNECT_RATE="0")
+    env.update(item.split("=", 1) for item in args.backend_env)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--no-access-log", "--log-level", "warning"],
+        cwd=os.path.join(ROOT, "backend"), env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited during startup (code {process.returncode}).")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=2) as response:
+                if response.status == 200:
+                    return process, f"ws://127.0.0.1:{port}/ws/chat"
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Backend not ready after 60s.")
+
+
+async def ask(ws, prompt: str, request_id: str) -> tuple[float | None, float, str]:
+    """Send one prompt; return (ttft, end_to_end, outcome) with outcome "ok", "error" or "rejected"."""
+    sent = time.perf_counter()
+    ttft = None
+    await ws.send(json.dumps({"message": prompt, "request_id": request_id}))
+    while True:
+        event = json.loads(await ws.recv())
+        if event.get("request_id") not in (None, request_id):
+            continue
+        if ttft is None and event["type"] in ("thought", "text_chunk"):
+            ttft = time.perf_counter() - sent
+        if event["type"] == "stream_end":
+            return ttft, time.perf_counter() - sent, "ok"
+        if event["type"] == "error":
+            rejected = "retry_after" in (event.get("details") or {})
+            return ttft, time.perf_counter() - sent, "rejected" if rejected else "error"
+
+
+async def client(ws, index: int, args, results: dict):
+    for n in range(args.prompts):
+        prompt = PROMPTS[(index + n) % len(PROMPTS)]
+        try:
+            ttft, e2e, outcome = await ask(ws, prompt, f"c{index}-{n}")
+        except websockets.ConnectionClosed:
+            results["errors"] += args.prompts - n
+            return
+        if outcome == "ok":
+            results["e2e"].append(e2e)
+            if ttft is not None:
+                results["ttft"].append(ttft)
+        elif outcome == "rejected":
+            results["rejected"] += 1
+        else:
+            results["errors"] += 1
+        if args.think_time:
+            await asyncio.sleep(args.think_time)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args, backend: subprocess.Popen, url: str) -> dict:
+    # Warm up pools, tool catalogue and code paths before measuring.
+    async with websockets.connect(url) as ws:
+        for n in range(3):
+            await ask(ws, PROMPTS[n % len(PROMPTS)], f"warm-{n}")
+    await asyncio.sleep(0.5)
+    rss_baseline = rss_bytes(backend.pid)
+
+    connections = await asyncio.gather(*(websockets.connect(url, max_size=None) for _ in range(args.clients)))
+    await asyncio.sleep(0.5)
+    rss_idle = rss_bytes(backend.pid)
+
+    results = {"ttft": [], "e2e": [], "errors": 0, "rejected": 0}
+    peak = {"rss": rss_idle}
+
+    async def sample_rss():
+        while True:
+            peak["rss"] = max(peak["rss"], rss_bytes(backend.pid))
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(client(ws, i, args, results) for i, ws in enumerate(connections)))
+    duration = time.perf_counter() - started
+    sampler.cancel()
+    await asyncio.gather(*(ws.close() for ws in connections))
+
+    completed = len(results["e2e"])
+    return {
+        "clients": args.clients,
+        "prompts": completed,
+        "errors": results["errors"],
+        "rejected": results["rejected"],
+        "duration_s": duration,
+        "prompts_per_s": completed / duration if duration else 0.0,
+        "ttft_ms": {p: percentile(results["ttft"], p) * 1000 for p in (50, 90, 99)},
+        "e2e_ms": {p: percentile(results["e2e"], p) * 1000 for p in (50, 90, 99)},
+        "rss_baseline_mb": rss_baseline / 2**20,
+        "rss_idle_kb_per_connection": (rss_idle - rss_baseline) / 1024 / args.clients,
+        "rss_peak_kb_per_connection": (peak["rss"] - rss_baseline) / 1024 / args.clients,
+    }
+
+
+def report(result: dict):
+    print(f"{result['prompts']} prompts from {result['clients']} clients in {result['duration_s']:.2f} s "
+          f"({result['errors']} errors, {result.get('rejected', 0)} rejected by admission control)")
+    print(f"throughput      {result['prompts_per_s']:8.1f} prompts/s")
+    for key, label in (("ttft_ms", "TTFT"), ("e2e_ms", "end-to-end")):
+        p = result[key]
+        print(f"{label:<15} p50 {p[50]:7.1f} ms  p90 {p[90]:7.1f} ms  p99 {p[99]:7.1f} ms")
+    print(f"backend RSS     {result['rss_baseline_mb']:.1f} MB baseline, "
+          f"{result['rss_idle_kb_per_connection']:.1f} KB/connection idle, "
+          f"{result['rss_peak_kb_per_connection']:.1f} KB/connection at peak")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions beyond `tolerance` (a fraction) relative to a previous --json result."""
+    regressions = []
+    if result["prompts_per_s"] < baseline["prompts_per_s"] * (1 - tolerance):
+        regressions.append(f"throughput {result['prompts_per_s']:.1f} < {baseline['prompts_per_s']:.1f} prompts/s")
+    for key in ("ttft_ms", "e2e_ms"):
+        for p in ("50", "99"):
+            now, before = result[key][int(p)], baseline[key][p]
+            if now > before * (1 + tolerance):
+                regressions.append(f"{key} p{p} {now:.1f} > {before:.1f} ms")
+    if result["errors"] > baseline["errors"]:
+        regressions.append(f"errors {result['errors']} > {baseline['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent WebSocket clients")
+    parser.add_argument("--prompts", type=int, default=10, help="prompts each client sends, one at a time")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds a client waits between prompts")
+    parser.add_argument("--first-chunk-delay", type=float, default=0.05, help="fake model: seconds to its first chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="fake model: seconds between later chunks")
+    parser.add_argument("--thoughts", type=int, default=2, help="fake model: thought chunks per model call")
+    parser.add_argument("--text-chunks", type=int, default=8, help="fake model: answer text chunks")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="fake model: sequential tool rounds per prompt")
+    parser.add_argument("--parallel-calls", type=int, default=1, help="fake model: independent tool calls per round")
+    parser.add_argument("--fast-path", action="store_true", help="turn ARITHMETIC_FAST_PATH on (prompts here are not plain expressions)")
+    parser.add_argument("--backend-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra backend environment, e.g. --backend-env MCP_POOL_SIZE=32 (repeatable)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare with a previous --json file and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression for --baseline")
+    args = parser.parse_args()
+
+    script = CalculatorScript(thoughts=args.thoughts, text_chunks=args.text_chunks, tool_rounds=args.tool_rounds,
+                              parallel_calls=args.parallel_calls)
+    fake = FakeGeminiServer(script=script, chunk_delay=args.chunk_delay, first_chunk_delay=args.first_chunk_delay).start()
+    mcp_server = InProcessMcpServer().start()
+    backend = None
+    try:
+        backend, url = start_backend(args, fake, mcp_server)
+        result = asyncio.run(run(args, backend, url))
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait(timeout=30)
+        mcp_server.stop()
+        fake.stop()
+
+    report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
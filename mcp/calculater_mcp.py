@@ -1,8 +1,80 @@
 # calculator_mcp_server_streamablehttp.py (Simplified run for Uvicorn defaults)
 from mcp.server.fastmcp import FastMCP
+import asyncio
+import importlib.util
+import math
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Literal
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+def lazy_import(name: str):
+    """The named module, executed on first attribute access; None if it is not installed."""
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = sys.modules[name] = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+# Optional: vector tools fall back to plain Python loops without it. Loaded by the first vector
+# call rather than before the port opens (it adds ~80 ms to startup).
+np = lazy_import("numpy")
+
+# Share the backend's stdlib-only metrics, logging and shared-store modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from expression_evaluator import DIVIDE_BY_ZERO_ERROR, ExpressionError, evaluate_expression, cache_info
+from result_cache import memoized, result_cache
+from metrics import PROMETHEUS_CONTENT_TYPE, Counter, Histogram, render_metrics
+from app_logging import configure_logging, get_logger
+from lifecycle import lifecycle
+
+configure_logging()
+log = get_logger("server.tools")
+
+TOOL_SECONDS = Histogram("calculator_tool_seconds", "Tool execution time inside the MCP server.", labelnames=("tool",))
+TOOL_CALLS_TOTAL = Counter("calculator_tool_calls_total", "Tool calls handled, by outcome.", labelnames=("tool", "outcome"))
+
+
+class InstrumentedFastMCP(FastMCP):
+    """FastMCP that records the latency and outcome of every tool call and reports readiness."""
+
+    def streamable_http_app(self):
+        app = super().streamable_http_app()
+        serve = app.router.lifespan_context
+
+        @asynccontextmanager
+        async def lifespan(app):
+            async with serve(app) as state:
+                # Requests are short and stateless, so uvicorn's own graceful shutdown drains them.
+                lifecycle.install_signal_handlers()
+                lifecycle.mark_ready()
+                yield state
+
+        app.router.lifespan_context = lifespan
+        return app
+
+    async def call_tool(self, name, arguments):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await super().call_tool(name, arguments)
+            outcome = "ok"
+            return result
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - started, name)
+            TOOL_CALLS_TOTAL.inc(name, outcome)
+
 
 # 1. Create an MCP server instance
-mcp = FastMCP(
+mcp = InstrumentedFastMCP(
     name="CalculatorStreamableHttpServer",
     description="An MCP server using Streamable HTTP, providing basic arithmetic calculation tools.",
     stateless_http=True
@@ -10,6 +82,7 @@ mcp = FastMCP(
 
 # ... (TOOL DEFINITIONS - add, subtract, multiply, divide - same as before) ...
 @mcp.tool()
+@memoized("add")
 def add(a: float, b: float) -> float:
     """
     Adds two numbers together.
@@ -21,11 +94,11 @@ def add(a: float, b: float) -> float:
     Returns:
         float: The sum of a and b.
     """
-    print(f"[Server Log StreamHTTP] Tool 'add' called with a={a}, b={b}")
     result = a + b
-    print(f"[Server Log StreamHTTP] Tool 'add' result: {result}")
+    log.debug("Tool 'add' called with a=%s, b=%s, result: %s", a, b, result)
     return result
 @mcp.tool()
+@memoized("subtract")
 def subtract(a: float, b: float) -> float:
     """
     Subtracts the second number from the first number.
@@ -37,11 +110,11 @@ def subtract(a: float, b: float) -> float:
     Returns:
         float: The result of a minus b.
     """
-    print(f"[Server Log StreamHTTP] Tool 'subtract' called with a={a}, b={b}")
     result = a - b
-    print(f"[Server Log StreamHTTP] Tool 'subtract' result: {result}")
+    log.debug("Tool 'subtract' called with a=%s, b=%s, result: %s", a, b, result)
     return result
 @mcp.tool()
+@memoized("multiply")
 def multiply(a: float, b: float) -> float:
     """
     Multiplies two numbers.
@@ -53,11 +126,11 @@ def multiply(a: float, b: float) -> float:
     Returns:
         float: The product of a and b.
     """
-    print(f"[Server Log StreamHTTP] Tool 'multiply' called with a={a}, b={b}")
     result = a * b
-    print(f"[Server Log StreamHTTP] Tool 'multiply' result: {result}")
+    log.debug("Tool 'multiply' called with a=%s, b=%s, result: %s", a, b, result)
     return result
 @mcp.tool()
+@memoized("divide")
 def divide(numerator: float, denominator: float) -> float | str:
     """
     Divides the numerator by the denominator.
@@ -70,16 +143,225 @@ def divide(numerator: float, denominator: float) -> float | str:
         float: The result of the division if denominator is not zero.
         str: An error message if denominator is zero.
     """
-    print(f"[Server Log StreamHTTP] Tool 'divide' called with numerator={numerator}, denominator={denominator}")
     if denominator == 0:
-        print("[Server Log StreamHTTP] Tool 'divide' error: Division by zero.")
-        return "Error: Cannot divide by zero."
+        log.debug("Tool 'divide' called with numerator=%s, denominator=%s: division by zero", numerator, denominator)
+        return DIVIDE_BY_ZERO_ERROR
     result = numerator / denominator
-    print(f"[Server Log StreamHTTP] Tool 'divide' result: {result}")
+    log.debug("Tool 'divide' called with numerator=%s, denominator=%s, result: %s", numerator, denominator, result)
     return result
 
+# --- Vector / batch tools ---
+# One call handles a whole array, so summing a column is one tool invocation instead of thousands.
+Operation = Literal["add", "subtract", "multiply", "divide"]
+
+class BatchOperation(BaseModel):
+    op: Operation
+    a: float
+    b: float
+
+def _apply_elementwise(op: str, a: list[float], b: list[float]) -> list[float | str]:
+    if np is None:
+        if op == "add":
+            return [x + y for x, y in zip(a, b)]
+        if op == "subtract":
+            return [x - y for x, y in zip(a, b)]
+        if op == "multiply":
+            return [x * y for x, y in zip(a, b)]
+        return [DIVIDE_BY_ZERO_ERROR if y == 0 else x / y for x, y in zip(a, b)]
+    left = np.asarray(a, dtype=np.float64)
+    right = np.asarray(b, dtype=np.float64)
+    if op == "add":
+        return (left + right).tolist()
+    if op == "subtract":
+        return (left - right).tolist()
+    if op == "multiply":
+        return (left * right).tolist()
+    zero = right == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quotient = np.divide(left, np.where(zero, 1.0, right))
+    results = quotient.tolist()
+    if zero.any():
+        for i in np.flatnonzero(zero).tolist():
+            results[i] = DIVIDE_BY_ZERO_ERROR
+    return results
+
+@mcp.tool()
+def elementwise(op: Operation, a: list[float], b: list[float] | float) -> list[float | str]:
+    """
+    Applies add, subtract, multiply or divide element by element over two arrays.
+
+    Args:
+        op (str): One of "add", "subtract", "multiply", "divide".
+        a (list[float]): The left-hand operands.
+        b (list[float] | float): The right-hand operands, same length as a, or a single number applied to every element.
+
+    Returns:
+        list[float | str]: One result per element. Elements divided by zero hold an error message instead.
+    """
+    log.debug("Tool 'elementwise' called with op=%s, len(a)=%s", op, len(a))
+    if isinstance(b, (int, float)):
+        b = [float(b)] * len(a)
+    if len(a) != len(b):
+        raise ValueError(f"Arrays must have the same length (got {len(a)} and {len(b)}).")
+    return _apply_elementwise(op, a, b)
+
+@mcp.tool(name="sum")
+def sum_values(values: list[float]) -> float:
+    """
+    Adds up all numbers in a list.
+
+    Args:
+        values (list[float]): The numbers to add.
+
+    Returns:
+        float: The total (0 for an empty list).
+    """
+    log.debug("Tool 'sum' called with %s values", len(values))
+    if np is None:
+        return math.fsum(values)
+    return float(np.sum(np.asarray(values, dtype=np.float64)))
+
+@mcp.tool(name="product")
+def product_values(values: list[float]) -> float:
+    """
+    Multiplies all numbers in a list together.
+
+    Args:
+        values (list[float]): The numbers to multiply.
+
+    Returns:
+        float: The product (1 for an empty list).
+    """
+    log.debug("Tool 'product' called with %s values", len(values))
+    if np is None:
+        return float(math.prod(values))
+    return float(np.prod(np.asarray(values, dtype=np.float64)))
+
+@mcp.tool(name="mean")
+def mean_values(values: list[float]) -> float | str:
+    """
+    Computes the arithmetic mean of a list of numbers.
+
+    Args:
+        values (list[float]): The numbers to average.
+
+    Returns:
+        float: The mean of the values.
+        str: An error message if the list is empty.
+    """
+    log.debug("Tool 'mean' called with %s values", len(values))
+    if not values:
+        return "Error: Cannot take the mean of an empty list."
+    if np is None:
+        return math.fsum(values) / len(values)
+    return float(np.mean(np.asarray(values, dtype=np.float64)))
+
+@mcp.tool()
+def dot(a: list[float], b: list[float]) -> float:
+    """
+    Computes the dot product of two arrays (sum of element-wise products).
+
+    Args:
+        a (list[float]): The first array.
+        b (list[float]): The second array, same length as a.
+
+    Returns:
+        float: The dot product of a and b.
+    """
+    log.debug("Tool 'dot' called with len(a)=%s, len(b)=%s", len(a), len(b))
+    if len(a) != len(b):
+        raise ValueError(f"Arrays must have the same length (got {len(a)} and {len(b)}).")
+    if np is None:
+        return math.fsum(x * y for x, y in zip(a, b))
+    return float(np.dot(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)))
+
+@mcp.tool()
+def batch_calculate(operations: list[BatchOperation]) -> list[float | str]:
+    """
+    Runs many independent two-number calculations in a single call.
+
+    Args:
+        operations (list[dict]): Records like {"op": "divide", "a": 10, "b": 4}, where op is one of
+            "add", "subtract", "multiply", "divide".
+
+    Returns:
+        list[float | str]: One result per record, in order. Divisions by zero hold an error message instead.
+    """
+    log.debug("Tool 'batch_calculate' called with %s operations", len(operations))
+    results: list[float | str] = [0.0] * len(operations)
+    # Group records by op so each group is one vectorized computation.
+    groups: dict[str, list[int]] = {}
+    for i, record in enumerate(operations):
+        groups.setdefault(record.op, []).append(i)
+    for op, indexes in groups.items():
+        group_results = _apply_elementwise(op, [operations[i].a for i in indexes], [operations[i].b for i in indexes])
+        for i, value in zip(indexes, group_results):
+            results[i] = value
+    return results
+
+# --- Whole-expression tool ---
+@mcp.tool()
+@memoized("evaluate")
+def evaluate(expression: str, include_steps: bool = True) -> dict:
+    """
+    Evaluates a whole arithmetic expression in one call, following the B,O,D,M,A,S (PEMDAS) rule.
+
+    Supports numbers, +, -, *, /, unary signs and brackets, e.g. "12*(3+4)/7".
+
+    Args:
+        expression (str): The arithmetic expression to evaluate.
+        include_steps (bool): If true, also return each intermediate add/subtract/multiply/divide step.
+
+    Returns:
+        dict: {"result": number or error message, "steps": [{"name", "args", "result"}, ...]}.
+            The result is an error message if the expression divides by zero.
+    """
+    try:
+        output = evaluate_expression(expression, include_steps=include_steps)
+    except ExpressionError as e:
+        raise ValueError(str(e)) from e
+    log.debug("Tool 'evaluate' called with expression=%r, result: %s", expression, output['result'])
+    return output
+
+# --- Cache statistics ---
+@mcp.tool()
+async def cache_stats() -> dict:
+    """
+    Reports hit/miss statistics for the server's calculation caches.
+
+    Memoization of add, subtract, multiply, divide and evaluate results is opt-in (CALC_MEMOIZE=1).
+    Vector tools are never memoized: hashing a large array costs as much as computing it.
+
+    Returns:
+        dict: {"results": memoization stats, "compiled_expressions": evaluate's parse cache stats}.
+    """
+    info = cache_info()
+    return {
+        "results": await asyncio.to_thread(result_cache.stats),  # Its size may come from the store manager
+        "compiled_expressions": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize},
+    }
+
+# --- Metrics ---
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+# --- Health ---
+@mcp.custom_route("/healthz", methods=["GET"])
+async def healthz(request: Request) -> Response:
+    return JSONResponse(lifecycle.status())
+
+@mcp.custom_route("/readyz", methods=["GET"])
+async def readyz(request: Request) -> Response:
+    status = lifecycle.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+def create_app():
+    """ASGI app factory for running workers directly: uvicorn calculater_mcp:create_app --factory --workers N"""
+    return mcp.streamable_http_app()
+
 if __name__ == "__main__":
-    print(f"Starting CalculatorStreamableHttpServer (FastMCP application defined).")
-    print(f"When run with 'mcp run calculator_mcp_server_streamablehttp.py --transport streamable-http',")
-    print(f"it will likely use Uvicorn's default host/port (e.g., 127.0.0.1:8000) or PORT/HOST env vars.")
+    log.info("Starting CalculatorStreamableHttpServer (FastMCP application defined).")
+    log.info("When run with 'mcp run calculator_mcp_server_streamablehttp.py --transport streamable-http',")
+    log.info("it will likely use Uvicorn's default host/port (e.g., 127.0.0.1:8000) or PORT/HOST env vars.")
     mcp.run(transport="streamable-http")
\ No newline at end of file
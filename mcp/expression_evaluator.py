@@ -0,0 +1,134 @@
+# expression_evaluator.py
+# Safe arithmetic expression evaluation for the calculator MCP server (no eval()).
+import ast
+import functools
+import os
+import re
+
+EVALUATE_CACHE_SIZE = int(os.getenv("EVALUATE_CACHE_SIZE", "4096"))
+MAX_EXPRESSION_LENGTH = 4096
+MAX_OPERATIONS = 512
+
+DIVIDE_BY_ZERO_ERROR = "Error: Cannot divide by zero."
+
+_NUMBER_RE = re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+
+# Tool names and argument names of the scalar calculator tools, so a step trace
+# looks exactly like the individual tool calls the UI already renders.
+_BIN_OPS = {
+    ast.Add: ("add", "a", "b"),
+    ast.Sub: ("subtract", "a", "b"),
+    ast.Mult: ("multiply", "a", "b"),
+    ast.Div: ("divide", "numerator", "denominator"),
+}
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def split_template(expression: str) -> tuple[str, tuple[float, ...]]:
+    """Replace each number with a numbered slot: "12*(3+4)" -> ("_0*(_1+_2)", (12.0, 3.0, 4.0)).
+
+    Expressions that differ only in their numbers share one template, so they
+    share one compiled plan in the cache.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters.")
+    if "_" in expression:
+        raise ExpressionError("Unsupported character '_' in expression.")
+    expression = expression.replace("×", "*").replace("÷", "/")
+    constants = []
+
+    def slot(match):
+        constants.append(float(match.group(0)))
+        return f"_{len(constants) - 1}"
+
+    template = _NUMBER_RE.sub(slot, expression)
+    return " ".join(template.split()), tuple(constants)
+
+
+@functools.lru_cache(maxsize=EVALUATE_CACHE_SIZE)
+def compile_template(template: str) -> tuple:
+    """Compile a template into BODMAS-ordered (tool, arg_names, left, right) steps.
+
+    Operands are ("const", slot), ("neg", slot) or ("step", index).
+    """
+    try:
+        tree = ast.parse(template, mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from e
+    steps = []
+
+    def visit(node):
+        if isinstance(node, ast.Name) and re.fullmatch(r"_\d+", node.id):
+            return ("const", int(node.id[1:]))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            operand = visit(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if operand[0] == "const":
+                return ("neg", operand[1])
+            if operand[0] == "neg":
+                return ("const", operand[1])
+            steps.append(("subtract", ("a", "b"), ("zero", 0), operand))
+            return ("step", len(steps) - 1)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+            left = visit(node.left)
+            right = visit(node.right)
+            tool_name, left_name, right_name = _BIN_OPS[type(node.op)]
+            steps.append((tool_name, (left_name, right_name), left, right))
+            if len(steps) > MAX_OPERATIONS:
+                raise ExpressionError(f"Expression has more than {MAX_OPERATIONS} operations.")
+            return ("step", len(steps) - 1)
+        raise ExpressionError(f"Unsupported syntax in expression: {type(node).__name__}")
+
+    root = visit(tree.body)
+    return tuple(steps), root
+
+
+def evaluate_expression(expression: str, include_steps: bool = False) -> dict:
+    """Evaluate an arithmetic expression; returns {"result": ..., "steps": [...]?}."""
+    template, constants = split_template(expression)
+    steps, root = compile_template(template)
+    results = []
+
+    def value_of(operand):
+        kind, index = operand
+        if kind == "const":
+            return constants[index]
+        if kind == "neg":
+            return -constants[index]
+        if kind == "zero":
+            return 0.0
+        return results[index]
+
+    trace = []
+    for tool_name, (left_name, right_name), left, right in steps:
+        a, b = value_of(left), value_of(right)
+        if tool_name == "add":
+            result = a + b
+        elif tool_name == "subtract":
+            result = a - b
+        elif tool_name == "multiply":
+            result = a * b
+        elif b == 0:
+            trace.append({"name": tool_name, "args": {left_name: a, right_name: b}, "result": DIVIDE_BY_ZERO_ERROR})
+            output = {"result": DIVIDE_BY_ZERO_ERROR}
+            if include_steps:
+                output["steps"] = trace
+            return output
+        else:
+            result = a / b
+        results.append(result)
+        if include_steps:
+            trace.append({"name": tool_name, "args": {left_name: a, right_name: b}, "result": result})
+
+    output = {"result": value_of(root)}
+    if include_steps:
+        output["steps"] = trace
+    return output
+
+
+def cache_info():
+    return compile_template.cache_info()
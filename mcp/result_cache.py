@@ -0,0 +1,96 @@
+# result_cache.py
+# Opt-in memoization for the calculator tools, which are pure functions of their arguments.
+import functools
+import os
+import threading
+
+from pydantic import BaseModel
+
+from shared_store import call_store, get_store  # backend/shared_store.py, on sys.path via calculater_mcp.py
+
+CALC_MEMOIZE = os.getenv("CALC_MEMOIZE", "0") == "1"
+CALC_MEMOIZE_SIZE = int(os.getenv("CALC_MEMOIZE_SIZE", "10000"))
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Bounded LRU of tool results with hit/miss counters, kept in the shared store."""
+
+    def __init__(self, max_size: int = CALC_MEMOIZE_SIZE, enabled: bool = CALC_MEMOIZE):
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._store = get_store("server_tool_results", max_size) if enabled else None
+        self._lock = threading.Lock()  # Guards the counters
+
+    async def get(self, key):
+        """Return (found, value)."""
+        value = await call_store(self._store, "get", key, _MISSING)
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, value
+
+    async def put(self, key, value):
+        await call_store(self._store, "set", key, value)
+
+    def clear(self):
+        if self._store is not None:
+            self._store.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": self._store.size() if self._store is not None else 0,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache()
+
+
+def _freeze(value):
+    if isinstance(value, BaseModel):
+        return _freeze(value.model_dump())
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def memoized(tool_name: str, cache: ResultCache = result_cache):
+    """Serve repeated calls with identical arguments from `cache` when memoization is enabled.
+
+    The memoized tool is async, so FastMCP awaits it and store lookups stay off the event loop.
+    """
+
+    def decorator(fn):
+        if not cache.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = (tool_name, _freeze(args), _freeze(kwargs))
+            found, value = await cache.get(key)
+            if found:
+                return value
+            value = fn(*args, **kwargs)
+            await cache.put(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Production launcher: N chat backend workers and N MCP server workers.
+
+Both servers run under uvicorn's multi-worker supervisor. Caches (tool schemas, tool
+results) go into one shared store process so new workers start warm. On SIGTERM or
+Ctrl+C the backend drains first (readiness turns 503, new prompts are refused and
+in-flight ones finish), then the MCP server and the store are stopped.
+
+Usage:
+  python serve.py --workers 4 --mcp-workers 2
+  python serve.py --host 0.0.0.0 --port 8001 --mcp-port 8000 --drain-timeout 60
+
+Endpoints: GET /healthz (liveness) and GET /readyz (readiness) on both servers.
+"""
+
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from shared_store import start_store_server
+
+READY_TIMEOUT = 60
+
+
+def _ignore_sigint():
+    # The store must outlive Ctrl+C until the workers using it have drained.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def uvicorn_command(app: str, host: str, port: int, workers: int, args, factory: bool = False) -> list[str]:
+    command = [sys.executable, "-m", "uvicorn", app, "--host", host, "--port", str(port),
+               "--workers", str(workers), "--timeout-graceful-shutdown", str(int(args.drain_timeout))]
+    if factory:
+        command.append("--factory")
+    if not args.access_log:
+        command.append("--no-access-log")  # One synchronous log line per request otherwise
+    return command
+
+
+def connect_host(host: str) -> str:
+    return "127.0.0.1" if host in ("0.0.0.0", "::", "") else host
+
+
+def wait_ready(name: str, url: str, process: subprocess.Popen, timeout: float = READY_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            print(f"{name} exited during startup (code {process.returncode}).")
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    print(f"{name} ready at {url.rsplit('/', 1)[0]}")
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.25)
+    print(f"{name} not ready after {timeout:.0f}s.")
+    return False
+
+
+def stop(name: str, process: subprocess.Popen | None, timeout: float):
+    if process is None or process.poll() is not None:
+        return
+    print(f"Stopping {name} (up to {timeout:.0f}s)...")
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"{name} did not stop in time; killing it.")
+        process.kill()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"), help="chat backend bind address")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8001")), help="chat backend port")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")), help="chat backend workers")
+    parser.add_argument("--mcp-host", default=os.getenv("MCP_HOST", "127.0.0.1"), help="MCP server bind address")
+    parser.add_argument("--mcp-port", type=int, default=int(os.getenv("MCP_PORT", "8000")), help="MCP server port")
+    parser.add_argument("--mcp-workers", type=int, default=int(os.getenv("MCP_WORKERS", "1")), help="MCP server workers")
+    parser.add_argument("--drain-timeout", type=float, default=float(os.getenv("DRAIN_TIMEOUT", "30")),
+                        help="seconds in-flight prompts may take to finish after SIGTERM")
+    parser.add_argument("--store", choices=("auto", "memory", "manager"), default="auto",
+                        help="cache store: per-process memory, or one shared manager process (auto: shared when any worker count > 1)")
+    parser.add_argument("--access-log", action="store_true", help="enable uvicorn access logs")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DRAIN_TIMEOUT=str(args.drain_timeout))
+    store_manager = None
+    use_manager = args.store == "manager" or (args.store == "auto" and max(args.workers, args.mcp_workers) > 1)
+    if use_manager:
+        authkey = secrets.token_hex(16)
+        store_manager = start_store_server(authkey=authkey, initializer=_ignore_sigint)
+        host, port = store_manager.address
+        env.update(SHARED_STORE=f"manager://{host}:{port}", SHARED_STORE_AUTHKEY=authkey)
+        print(f"Shared cache store at {host}:{port}")
+    else:
+        env["SHARED_STORE"] = "memory"
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    mcp_server = backend = None
+    exit_code = 0
+    try:
+        # Children get their own session so Ctrl+C reaches only this launcher, which stops them in order.
+        mcp_server = subprocess.Popen(
+            uvicorn_command("calculater_mcp:create_app", args.mcp_host, args.mcp_port, args.mcp_workers, args, factory=True),
+            cwd=os.path.join(ROOT, "mcp"), env=env, start_new_session=True)
+        mcp_base = f"http://{connect_host(args.mcp_host)}:{args.mcp_port}"
+        if not wait_ready("MCP server", f"{mcp_base}/readyz", mcp_server):
+            exit_code = 1
+            return
+
+        backend_env = dict(env, MCP_SERVER_URL=env.get("MCP_SERVER_URL", f"{mcp_base}/mcp"))
+        backend = subprocess.Popen(
+            uvicorn_command("main:app", args.host, args.port, args.workers, args),
+            cwd=os.path.join(ROOT, "backend"), env=backend_env, start_new_session=True)
+        if not wait_ready("Chat backend", f"http://{connect_host(args.host)}:{args.port}/readyz", backend):
+            exit_code = 1
+            return
+
+        while not stopping:
+            for name, process in (("MCP server", mcp_server), ("Chat backend", backend)):
+                if process.poll() is not None:
+                    print(f"{name} exited unexpectedly (code {process.returncode}); shutting down.")
+                    exit_code = 1
+                    stopping = True
+            time.sleep(0.5)
+    finally:
+        # Backend first: its in-flight prompts still need the MCP server and the store.
+        stop("chat backend", backend, timeout=2 * args.drain_timeout + 10)
+        stop("MCP server", mcp_server, timeout=args.drain_timeout + 10)
+        if store_manager is not None:
+            store_manager.shutdown()
+        sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
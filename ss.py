@@ -12,22 +12,61 @@ Usage:
   # Create snapshot FROM 'my_project_folder' TO 'snapshot.md' (Folder -> Markdown)
   python this_script.py fm ./my_project_folder -o snapshot.md
 
-  # Create snapshot with additional ignore patterns
+  # Create snapshot with additional ignore patterns (gitignore syntax; .gitignore files are honored too)
   python this_script.py fm ./proj -o out.md --ignore "*.log" --ignore "temp/"
 
+  # Re-snapshot reading only files changed since the last run (manifest in snapshot.md.manifest.json),
+  # and also write just the changes to changes.md
+  python this_script.py fm ./proj -o snapshot.md --incremental
+  python this_script.py fm ./proj -o snapshot.md --diff-output changes.md
+
   # Recreate folder structure FROM 'snapshot.md' TO 'recreated_project' (Markdown -> Folder)
   python this_script.py mf snapshot.md -o ./recreated_project
+
+  # Index the snapshot (snapshot.md.index.json), then pull out only some files by byte range
+  python this_script.py fm ./proj -o snapshot.md --index
+  python this_script.py mf snapshot.md -o ./some --only "backend/*.py" --only README.md
+
+  # Gzip the snapshot as it is written and store repeated files once (mf reads it as is)
+  python this_script.py fm ./proj -o snapshot.md.gz --dedup
 """
 
 import os
 import mimetypes
-import fnmatch
+import functools
 import platform
 import argparse
 import sys
+import codecs
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard  # Optional: only needed for .zst snapshots
+except ImportError:
+    zstandard = None
 
 # --- Configuration ---
 ENCODING = 'utf-8'
+READ_CHUNK_SIZE = 256 * 1024       # Bytes copied per step when streaming a large file
+PREFETCH_MAX_BYTES = 1024 * 1024   # Files up to this size are read and decoded ahead on the thread pool
+DEFAULT_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+PREFETCH_PER_WORKER = 4            # Files read ahead per worker; bounds memory to ~workers * 4 * PREFETCH_MAX_BYTES
+MANIFEST_SUFFIX = '.manifest.json' # Sidecar of an incremental snapshot: per-file size, mtime, hash and section
+MANIFEST_VERSION = 1
+INDEX_SUFFIX = '.index.json'       # Sidecar mapping each '## path' section to its byte range, for mf --only
+INDEX_VERSION = 1
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}  # --compress auto picks by output suffix
+COMPRESSION_LEVELS = {'gzip': 1, 'zstd': 3}  # Fast levels: compression runs inline with the snapshot writer
+DEDUP_MIN_CHARS = 512              # Shorter duplicates are stored again; a reference would save little
+DUPLICATE_MARKER = '**Duplicate of:**'
 
 # --- Default Ignore Patterns ---
 DEFAULT_IGNORE_PATTERNS = [
@@ -42,46 +81,505 @@ DEFAULT_IGNORE_PATTERNS = [
 
 # --- Core Helper Functions (No Changes Here) ---
 
-def is_ignored(relative_path, ignore_patterns):
-    normalized_path = relative_path.replace("\\", "/")
-    basename = os.path.basename(normalized_path)
-    is_case_sensitive_fs = platform.system() != "Windows"
-    for pattern in ignore_patterns:
-        if fnmatch.fnmatch(basename, pattern) or \
-           (not is_case_sensitive_fs and fnmatch.fnmatch(basename.lower(), pattern.lower())):
-            return True
-        if fnmatch.fnmatch(normalized_path, pattern) or \
-           (not is_case_sensitive_fs and fnmatch.fnmatch(normalized_path.lower(), pattern.lower())):
-            return True
-    return False
+CASE_INSENSITIVE_FS = platform.system() == "Windows"
+
+def glob_to_regex(glob):
+    """Translate one gitignore glob (no leading '!' or trailing '/') to a regex body.
+
+    '*' and '?' never match '/', a leading '**/' matches any number of directories,
+    '/**/' zero or more, and a trailing '/**' everything inside.
+    """
+    i, n, out = 0, len(glob), []
+    while i < n:
+        c = glob[i]
+        if c == "\\" and i + 1 < n:
+            out.append(re.escape(glob[i + 1])); i += 2
+        elif c == "*":
+            j = i
+            while j < n and glob[j] == "*": j += 1
+            whole_segment = j - i == 2 and (i == 0 or glob[i - 1] == "/")
+            if whole_segment and j == n:
+                out.append(".*")
+            elif whole_segment and glob[j] == "/":
+                out.append("(?:.*/)?"); j += 1
+            else:
+                out.append("[^/]*")
+            i = j
+        elif c == "?":
+            out.append("[^/]"); i += 1
+        elif c == "[":
+            j = i + 1
+            if j < n and glob[j] in "!^": j += 1
+            if j < n and glob[j] == "]": j += 1
+            while j < n and glob[j] != "]": j += 1
+            if j >= n:
+                out.append("\\["); i += 1; continue
+            body = glob[i + 1:j]
+            if body[0] in "!^": body = "^" + body[1:]
+            body = re.sub(r"([&~|\\\[])", r"\\\1", body)
+            out.append(f"(?!/)[{body}]"); i = j + 1
+        else:
+            out.append(re.escape(c)); i += 1
+    return "".join(out)
+
+def parse_ignore_pattern(line):
+    """Parse one .gitignore line into (negate, dir_only, anchored, glob), or None for blanks and comments."""
+    line = line.rstrip("\r\n")
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line): stripped += " "  # Escaped trailing space
+    line = stripped
+    if not line or line.startswith("#"): return None
+    negate = line.startswith("!")
+    if negate: line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line: return None
+    anchored = "/" in line  # A slash anywhere but the end ties the pattern to its .gitignore's directory
+    return negate, dir_only, anchored, line.lstrip("/")
+
+class PatternSet:
+    """Same-sign patterns merged for matching: literal names in a set, '*<suffix>' patterns as
+    one str.endswith() tuple, and everything else in one regex for basenames and one for paths."""
+
+    def __init__(self):
+        self.names, self.suffixes, self.name_regexes, self.path_regexes = set(), [], [], []
+        self.name_re = self.path_re = None
+
+    def add(self, anchored, glob):
+        if CASE_INSENSITIVE_FS: glob = glob.lower()
+        if anchored:
+            self.path_regexes.append(glob_to_regex(glob))
+        elif not any(ch in glob for ch in "*?[\\"):
+            self.names.add(glob)
+        elif glob.startswith("*") and not any(ch in glob[1:] for ch in "*?[\\"):
+            self.suffixes.append(glob[1:])
+        else:
+            self.name_regexes.append(glob_to_regex(glob))
+
+    def compile(self):
+        self.suffixes = tuple(self.suffixes)
+        if self.name_regexes: self.name_re = re.compile("(?:%s)\\Z" % "|".join(self.name_regexes), re.DOTALL)
+        if self.path_regexes: self.path_re = re.compile("(?:%s)\\Z" % "|".join(self.path_regexes), re.DOTALL)
+        return self
+
+    def matches(self, path, name):
+        return (name in self.names
+                or (self.suffixes and name.endswith(self.suffixes))
+                or (self.name_re is not None and self.name_re.match(name) is not None)
+                or (self.path_re is not None and self.path_re.match(path) is not None))
+
+class IgnoreRules:
+    """Ignore patterns from one source (defaults, --ignore, or a .gitignore in `base`), compiled once.
+
+    Like git, the last matching pattern wins: consecutive patterns of the same sign are
+    merged into one PatternSet and the sets are tried from last to first.
+    """
+
+    def __init__(self, patterns, base=""):
+        self.base = base
+        self.prefix = base + "/" if base else ""
+        if CASE_INSENSITIVE_FS: self.prefix = self.prefix.lower()
+        runs = []  # [negate, sets for directories, sets for files]
+        for line in patterns:
+            parsed = parse_ignore_pattern(line)
+            if parsed is None: continue
+            negate, dir_only, anchored, glob = parsed
+            if not runs or runs[-1][0] != negate:
+                runs.append([negate, PatternSet(), PatternSet()])
+            runs[-1][1].add(anchored, glob)
+            if not dir_only: runs[-1][2].add(anchored, glob)
+        self.runs = [(negate, dirs.compile(), files.compile()) for negate, dirs, files in reversed(runs)]
+
+    def match(self, path, name, is_dir):
+        """True (ignore), False (re-included by '!') or None (no pattern applies) for a root-relative path."""
+        if self.prefix:
+            if not path.startswith(self.prefix): return None
+            path = path[len(self.prefix):]
+        for negate, dirs, files in self.runs:
+            if (dirs if is_dir else files).matches(path, name):
+                return not negate
+        return None
+
+def read_gitignore(path, base):
+    try:
+        with open(path, "r", encoding=ENCODING, errors="replace") as f:
+            return IgnoreRules(f.read().splitlines(), base)
+    except OSError as e:
+        print(f"[WARN] Could not read {path}: {e}")
+        return None
+
+class IgnoreMatcher:
+    """Decides what a snapshot walk skips, with gitignore precedence.
+
+    Highest first: --ignore patterns, then .gitignore files found during the walk (deeper
+    ones override those above them), then DEFAULT_IGNORE_PATTERNS. Each directory's rule
+    stack is built once when the walk enters it.
+    """
+
+    def __init__(self, base_patterns=DEFAULT_IGNORE_PATTERNS, user_patterns=(), use_gitignore=True):
+        self.user = IgnoreRules(user_patterns)
+        self.default = IgnoreRules(base_patterns)
+        self.use_gitignore = use_gitignore
+        self._gitignores = {"": ()}  # directory relative to root -> its .gitignore rules, deepest first
+
+    def enter_directory(self, rel_dir, abs_dir, filenames):
+        """Record the .gitignore rules in effect inside `rel_dir` (call before matching its entries)."""
+        parent = self._gitignores.get(rel_dir.rpartition("/")[0], ()) if rel_dir else ()
+        rules = parent
+        if self.use_gitignore and ".gitignore" in filenames:
+            own = read_gitignore(os.path.join(abs_dir, ".gitignore"), rel_dir)
+            if own is not None and own.runs: rules = (own,) + parent
+        self._gitignores[rel_dir] = rules
+        return rules
+
+    def is_ignored(self, rel_path, is_dir, gitignores=()):
+        name = rel_path.rpartition("/")[2]
+        if CASE_INSENSITIVE_FS: rel_path, name = rel_path.lower(), name.lower()
+        for rules in (self.user, *gitignores, self.default):
+            decision = rules.match(rel_path, name, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+@functools.lru_cache(maxsize=32)
+def _compiled_patterns(patterns):
+    return IgnoreRules(patterns)
+
+def is_ignored(relative_path, ignore_patterns, is_dir=False):
+    """Gitignore-style check of one path (relative to the root) against a list of patterns."""
+    normalized_path = relative_path.replace("\\", "/").strip("/")
+    name = normalized_path.rpartition("/")[2]
+    if CASE_INSENSITIVE_FS: normalized_path, name = normalized_path.lower(), name.lower()
+    return _compiled_patterns(tuple(ignore_patterns)).match(normalized_path, name, is_dir) is True
+
+def only_filter(patterns):
+    """Predicate for mf --only: does a snapshot path match these gitignore-style patterns?"""
+    selector = IgnoreRules(patterns)
+    def selected(path):
+        # The file itself, then each directory above it, so "backend/" selects everything under backend.
+        decision = selector.match(path, path.rpartition("/")[2], False)
+        parent = path
+        while decision is None and "/" in parent:
+            parent = parent.rpartition("/")[0]
+            decision = selector.match(parent, parent.rpartition("/")[2], True)
+        return decision is True
+    return selected
+
+LANG_MAP_MIME = {
+    "text/x-python": "python", "application/x-python-code": "python",
+    "text/javascript": "javascript", "application/javascript": "javascript",
+    "text/html": "html", "text/css": "css", "application/json": "json",
+    "application/xml": "xml", "text/xml": "xml",
+    "text/x-java-source": "java", "text/x-java": "java",
+    "text/x-csrc": "c", "text/x-c": "c", "text/x-c++src": "cpp", "text/x-c++": "cpp",
+    "application/x-sh": "bash", "text/x-shellscript": "bash",
+    "text/markdown": "markdown", "text/x-yaml": "yaml", "application/x-yaml": "yaml",
+    "text/plain": ""
+}
+LANG_MAP_EXT = {
+    ".py": "python", ".pyw": "python", ".js": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".html": "html", ".htm": "html", ".css": "css", ".java": "java", ".cpp": "cpp", ".cxx": "cpp",
+    ".cc": "cpp", ".hpp": "cpp", ".hxx": "cpp", ".c": "c", ".h": "c", ".cs": "csharp", ".php": "php",
+    ".rb": "ruby", ".go": "go", ".rs": "rust", ".ts": "typescript", ".tsx": "typescript",
+    ".json": "json", ".xml": "xml", ".yaml": "yaml", ".yml": "yaml", ".sh": "bash", ".bash": "bash",
+    ".sql": "sql", ".md": "markdown", ".markdown": "markdown", ".txt": ""
+}
+_mimetypes_ready = False
 
 def guess_language(filepath):
-    mimetypes.init()
+    global _mimetypes_ready
+    if not _mimetypes_ready:  # mimetypes.init() re-reads the system MIME databases; do it once per process
+        mimetypes.init()
+        _mimetypes_ready = True
     mime_type, _ = mimetypes.guess_type(filepath)
     if mime_type:
-        lang_map_mime = {
-            "text/x-python": "python", "application/x-python-code": "python",
-            "text/javascript": "javascript", "application/javascript": "javascript",
-            "text/html": "html", "text/css": "css", "application/json": "json",
-            "application/xml": "xml", "text/xml": "xml",
-            "text/x-java-source": "java", "text/x-java": "java",
-            "text/x-csrc": "c", "text/x-c": "c", "text/x-c++src": "cpp", "text/x-c++": "cpp",
-            "application/x-sh": "bash", "text/x-shellscript": "bash",
-            "text/markdown": "markdown", "text/x-yaml": "yaml", "application/x-yaml": "yaml",
-            "text/plain": ""
-        }
-        if mime_type in lang_map_mime: return lang_map_mime[mime_type]
+        if mime_type in LANG_MAP_MIME: return LANG_MAP_MIME[mime_type]
         if mime_type.startswith("text/"): return ""
     _, ext = os.path.splitext(filepath.lower())
-    lang_map_ext = {
-        ".py": "python", ".pyw": "python", ".js": "javascript", ".mjs": "javascript", ".cjs": "javascript",
-        ".html": "html", ".htm": "html", ".css": "css", ".java": "java", ".cpp": "cpp", ".cxx": "cpp",
-        ".cc": "cpp", ".hpp": "cpp", ".hxx": "cpp", ".c": "c", ".h": "c", ".cs": "csharp", ".php": "php",
-        ".rb": "ruby", ".go": "go", ".rs": "rust", ".ts": "typescript", ".tsx": "typescript",
-        ".json": "json", ".xml": "xml", ".yaml": "yaml", ".yml": "yaml", ".sh": "bash", ".bash": "bash",
-        ".sql": "sql", ".md": "markdown", ".markdown": "markdown", ".txt": ""
-    }
-    return lang_map_ext.get(ext, "")
+    return LANG_MAP_EXT.get(ext, "")
+
+def new_text_decoder(encoding=ENCODING):
+    # Same result as open(..., "r"): strict decoding plus universal newlines, fed in chunks.
+    return io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(errors="strict"), translate=True)
+
+def scan_large_file(filepath, encoding=ENCODING):
+    """Decode-check and hash a file too large to hold, without keeping it: ("stream" or "binary", sha256)."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="strict")
+    sha = hashlib.sha256()
+    kind = "stream"
+    with open(filepath, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            sha.update(chunk)
+            if kind == "stream":
+                try:
+                    decoder.decode(chunk, final=not chunk)
+                except UnicodeDecodeError:
+                    kind = "binary"  # Keep reading: the hash still covers the whole file
+            if not chunk:
+                return kind, sha.hexdigest()
+
+def prefetch_file(filepath, encoding=ENCODING, digest=False, scan_large=False):
+    """Read and decode one file on a worker thread.
+
+    Returns (kind, language, payload, sha256): ("text", language, content, ...),
+    ("binary", None, None, ...), ("error", None, exception, None), or ("stream", language,
+    None, sha256) for files too large to hold; those are copied in chunks by the writer instead.
+    The hash of the raw bytes is only computed when `digest` is set. With `scan_large`, large
+    files are decode-checked and hashed here first (the writer then cannot roll back, or needs
+    the hash before writing); otherwise their hash is None.
+    """
+    try:
+        if os.path.getsize(filepath) > PREFETCH_MAX_BYTES:
+            if scan_large:
+                kind, sha = scan_large_file(filepath, encoding)
+                return kind, guess_language(filepath) if kind == "stream" else None, None, sha
+            return "stream", guess_language(filepath), None, None
+        with open(filepath, "rb") as f:
+            data = f.read()
+        sha = hashlib.sha256(data).hexdigest() if digest else None
+        try:
+            content = new_text_decoder(encoding).decode(data, final=True)
+        except UnicodeDecodeError:
+            return "binary", None, None, sha
+        return "text", guess_language(filepath), content, sha
+    except Exception as read_err:
+        return "error", None, read_err, None
+
+def detect_compression(path):
+    """'gzip', 'zstd' or None, from the file's magic bytes."""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic[:2] == b"\x1f\x8b": return "gzip"
+    if magic == b"\x28\xb5\x2f\xfd": return "zstd"
+    return None
+
+def require_compression(compression):
+    if compression not in (None, "gzip", "zstd"):
+        raise ValueError(f"Unknown compression '{compression}' (use gzip, zstd or none).")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd snapshots need the 'zstandard' package (pip install zstandard).")
+
+def open_snapshot_output(path, compression=None):
+    """Binary, buffered file for writing a snapshot, compressing as it goes."""
+    require_compression(compression)
+    if compression is None:
+        return open(path, "wb", buffering=READ_CHUNK_SIZE)
+    raw = open(path, "wb")
+    try:
+        if compression == "gzip":
+            stream = gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=COMPRESSION_LEVELS["gzip"])
+        else:
+            stream = zstandard.ZstdCompressor(level=COMPRESSION_LEVELS["zstd"]).stream_writer(raw, closefd=True)
+    except Exception:
+        raw.close()
+        raise
+    # Many small writes (headers, fences) would each be a compressor call without this buffer.
+    return io.BufferedWriter(_ClosingStream(stream, raw), buffer_size=READ_CHUNK_SIZE)
+
+class _ClosingStream(io.RawIOBase):
+    """Raw-IO face of a compressor stream, closing the underlying file after the compressor."""
+
+    def __init__(self, stream, raw):
+        self._stream, self._raw = stream, raw
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._stream.write(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._stream.close()
+            finally:
+                self._raw.close()
+                super().close()
+
+def open_snapshot_text(path, encoding=ENCODING):
+    """Text reader for a plain, gzip or zstd snapshot (detected from its first bytes)."""
+    compression = detect_compression(path)
+    require_compression(compression)
+    if compression is None:
+        return open(path, "r", encoding=encoding)
+    raw = open(path, "rb")
+    if compression == "gzip":
+        stream = gzip.GzipFile(fileobj=raw, mode="rb")
+    else:
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), READ_CHUNK_SIZE)
+    return io.TextIOWrapper(stream, encoding=encoding)
+
+class SnapshotWriter:
+    """Binary snapshot output that keeps track of its byte offset.
+
+    Text is encoded (with os.linesep newlines, as text mode would) on the way out, and
+    compressed if `compression` is set; offsets always count uncompressed bytes.
+    copy_from() queues byte ranges of another snapshot; adjacent ranges are merged and
+    copied in large chunks the next time text is written. Compressed output cannot be
+    rolled back.
+    """
+
+    def __init__(self, path, encoding=ENCODING, compression=None):
+        self.path = path
+        self.encoding = encoding
+        self.seekable = compression is None
+        self.file = open_snapshot_output(path, compression)
+        self.offset = 0
+        self._copy = None  # (source file, start, length) not yet copied
+        self._newline = os.linesep if os.linesep != "\n" else None
+
+    def write(self, text):
+        if self._copy: self._flush_copy()
+        if self._newline: text = text.replace("\n", self._newline)
+        data = text.encode(self.encoding)
+        self.file.write(data)
+        self.offset += len(data)
+
+    def copy_from(self, source, start, length):
+        if self._copy and self._copy[0] is source and self._copy[1] + self._copy[2] == start:
+            self._copy = (source, self._copy[1], self._copy[2] + length)
+        else:
+            if self._copy: self._flush_copy()
+            self._copy = (source, start, length)
+        self.offset += length
+
+    def _flush_copy(self):
+        source, start, remaining = self._copy
+        self._copy = None
+        source.seek(start)
+        while remaining:
+            chunk = source.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk: raise IOError(f"Previous snapshot ended before byte {start + remaining}")
+            self.file.write(chunk)
+            remaining -= len(chunk)
+
+    def flush(self):
+        if self._copy: self._flush_copy()
+        self.file.flush()
+
+    def rollback(self, offset):
+        self.flush()
+        self.file.seek(offset)
+        self.file.truncate()
+        self.offset = offset
+
+    def close(self):
+        try:
+            if self._copy: self._flush_copy()
+        finally:
+            self.file.close()
+
+def stream_file_block(writer, filepath, language, encoding=ENCODING, validated=False):
+    """Copy a large file into the snapshot chunk by chunk, decoding as it goes; returns its sha256.
+
+    On a decode or read error the output is rolled back to where the block began and the
+    error is re-raised. A file already `validated` by scan_large_file() is decoded leniently
+    instead, since non-seekable (compressed) output cannot be rolled back.
+    """
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(errors="replace"), translate=True) if validated else new_text_decoder(encoding)
+    sha = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        block_start = writer.offset
+        writer.write(f"```{language}\n")
+        try:
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                sha.update(chunk)
+                writer.write(decoder.decode(chunk, final=not chunk))
+                if not chunk:
+                    break
+        except Exception:
+            writer.rollback(block_start)
+            raise
+    writer.write("\n```\n\n")
+    return sha.hexdigest()
+
+def manifest_path(output_file):
+    return output_file + MANIFEST_SUFFIX
+
+def index_path(snapshot_file):
+    return snapshot_file + INDEX_SUFFIX
+
+def write_sidecar(path, snapshot_file, data):
+    """Write a JSON sidecar stamped with the snapshot's size and mtime, atomically."""
+    snapshot_stat = os.stat(snapshot_file)
+    data = dict(data, snapshot_size=snapshot_stat.st_size, snapshot_mtime_ns=snapshot_stat.st_mtime_ns)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(data, separators=(",", ":")))  # dumps() uses the C encoder; dump() does not
+    os.replace(tmp_path, path)
+
+def read_sidecar(path, snapshot_file, version):
+    """A sidecar's JSON if it exists and still describes `snapshot_file`; "stale" if it does not; else None."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        snapshot_stat = os.stat(snapshot_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Ignoring unreadable {path}: {e}")
+        return None
+    if (data.get("version") != version or data.get("snapshot_size") != snapshot_stat.st_size
+            or data.get("snapshot_mtime_ns") != snapshot_stat.st_mtime_ns):
+        return "stale"
+    return data
+
+def load_manifest(output_file, abs_root, encoding=ENCODING):
+    """The manifest left by the previous incremental run, or None if there is none or it no
+    longer describes the snapshot on disk (which is then rebuilt from scratch)."""
+    manifest = read_sidecar(manifest_path(output_file), output_file, MANIFEST_VERSION)
+    if manifest is None:
+        return None
+    if manifest == "stale" or manifest.get("root") != abs_root or manifest.get("encoding") != encoding:
+        print(f"[WARN] Manifest does not match {output_file}; taking a full snapshot.")
+        return None
+    return manifest
+
+def save_manifest(output_file, abs_root, encoding, started_ns, files):
+    write_sidecar(manifest_path(output_file), output_file, {
+        "version": MANIFEST_VERSION, "root": abs_root, "encoding": encoding, "started_ns": started_ns,
+        "files": files,  # path -> [size, mtime_ns, sha256, section offset, section length]
+    })
+
+def load_index(snapshot_file):
+    """path -> (offset, length) of every '## path' section, from the snapshot's index sidecar or,
+    failing that, its incremental manifest. None if neither exists or matches the snapshot."""
+    index = read_sidecar(index_path(snapshot_file), snapshot_file, INDEX_VERSION)
+    if isinstance(index, dict):
+        return {path: tuple(span) for path, span in index["files"].items()}
+    manifest = read_sidecar(manifest_path(snapshot_file), snapshot_file, MANIFEST_VERSION)
+    if isinstance(manifest, dict):
+        return {path: (entry[3], entry[4]) for path, entry in manifest["files"].items()}
+    if "stale" in (index, manifest):
+        print(f"[WARN] Index of {snapshot_file} is out of date; scanning the whole snapshot instead.")
+    return None
+
+def iter_snapshot_files(abs_root, matcher, counts, skip_paths=()):
+    """Yield (relative_path, absolute_path) in a stable order: directories and files sorted by name.
+
+    Ignored directories are pruned before the walk descends into them. `skip_paths` are
+    absolute paths never included (the snapshot's own output files).
+    """
+    root_len = len(abs_root) + 1
+    for dirpath, dirnames, filenames in os.walk(abs_root, topdown=True):
+        rel_dir = dirpath[root_len:].replace(os.sep, "/") if len(dirpath) >= root_len else ""
+        prefix = rel_dir + "/" if rel_dir else ""
+        gitignores = matcher.enter_directory(rel_dir, dirpath, filenames)
+        kept = sorted(d for d in dirnames if not matcher.is_ignored(prefix + d, True, gitignores))
+        counts["ignored"] += len(dirnames) - len(kept)
+        dirnames[:] = kept
+        filenames.sort()
+        for filename in filenames:
+            relative_filepath = prefix + filename
+            if matcher.is_ignored(relative_filepath, False, gitignores):
+                counts["ignored"] += 1; continue
+            filepath = os.path.join(dirpath, filename)
+            if filepath in skip_paths: continue
+            yield relative_filepath, filepath
 
 def write_code_to_file(output_dir, relative_filepath, code_lines, encoding=ENCODING):
     safe_relative_path = os.path.normpath(relative_filepath).replace("\\", "/")
@@ -112,122 +610,385 @@ def write_code_to_file(output_dir, relative_filepath, code_lines, encoding=ENCOD
 
 # --- Main Logic Functions (No Changes Here) ---
 
-def create_codebase_snapshot(root_dir, output_file, encoding=ENCODING, base_ignore_patterns=DEFAULT_IGNORE_PATTERNS, user_ignore_patterns=[]):
-    processed_files_count = 0
-    ignored_items_count = 0
+def create_codebase_snapshot(root_dir, output_file, encoding=ENCODING, base_ignore_patterns=DEFAULT_IGNORE_PATTERNS, user_ignore_patterns=[], workers=DEFAULT_WORKERS, use_gitignore=True, incremental=False, diff_output=None, write_index=False, compression="auto", dedup=False):
+    """Write the snapshot in one pass with bounded memory.
+
+    Files are read and decoded ahead on a thread pool (at most workers * PREFETCH_PER_WORKER
+    at a time) while this thread writes them out strictly in walk order, so the output is
+    the same for any number of workers. Files above PREFETCH_MAX_BYTES are streamed.
+
+    With `incremental`, a sidecar manifest records each file's size, mtime, hash and the
+    byte range of its section. The next run stats every file and copies the sections of
+    unchanged ones straight from the previous snapshot, reading only what changed.
+    `diff_output` (implies incremental) also writes a snapshot of just the added and
+    changed files, followed by a list of the deleted ones.
+
+    `write_index` writes <output>.index.json mapping every section to its byte range,
+    so `mf --only` can read just the files it needs.
+
+    `compression` ("gzip", "zstd", None, or "auto" to pick by the output's .gz/.zst suffix)
+    compresses the snapshot as it is written. With `dedup`, a file whose bytes match an
+    earlier one (and is at least DEDUP_MIN_CHARS long) is written as a reference to it,
+    which mf resolves by copying. Both rewrite the output as a whole, so neither combines
+    with `incremental`; an index needs uncompressed output.
+    """
+    counts = {"processed": 0, "ignored": 0, "reused": 0, "changed": 0, "deleted": 0, "duplicates": 0}
     errors = []
-    all_ignore_patterns = list(set(base_ignore_patterns + user_ignore_patterns))
+    matcher = IgnoreMatcher(base_ignore_patterns, user_ignore_patterns, use_gitignore)
     abs_root = os.path.abspath(root_dir)
     if not os.path.isdir(abs_root):
         print(f"[ERROR] Source directory not found or not a directory: {abs_root}", file=sys.stderr)
         return False, 0, 0, ["Source directory not found."]
+    incremental = incremental or diff_output is not None
+    if compression == "auto":
+        compression = COMPRESSION_SUFFIXES.get(os.path.splitext(output_file)[1].lower())
+    elif compression == "none":
+        compression = None
+    try:
+        require_compression(compression)
+        if incremental and (compression or dedup):
+            raise ValueError("--incremental/--diff-output cannot be combined with --compress or --dedup.")
+        if write_index and compression:
+            raise ValueError("--index needs an uncompressed snapshot.")
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return False, 0, 0, [str(e)]
+    abs_output = os.path.abspath(output_file)
+    tmp_output = abs_output + ".tmp"
+    skip_paths = {abs_output, tmp_output, manifest_path(abs_output), manifest_path(abs_output) + ".tmp",
+                  index_path(abs_output), index_path(abs_output) + ".tmp"}
+    if diff_output: skip_paths.add(os.path.abspath(diff_output))
 
     print("-" * 60)
     print(f"Starting snapshot creation (Folder -> Markdown):")
     print(f"  Source: {abs_root}")
     print(f"  Output: {output_file}")
-    print(f"  Ignoring: {all_ignore_patterns}")
+    if diff_output: print(f"  Changes: {diff_output}")
+    if compression or dedup: print(f"  Compression: {compression or 'none'}, dedup: {'on' if dedup else 'off'}")
+    print(f"  Ignoring: {list(base_ignore_patterns) + list(user_ignore_patterns)}{' + .gitignore files' if use_gitignore else ''}")
     print("-" * 60)
+    workers = max(1, workers)
+    started_ns = time.time_ns()
+    previous = load_manifest(abs_output, abs_root, encoding) if incremental else None
+    previous_files = previous["files"] if previous else {}
+    # Files modified at or after the previous run started may have changed within the same mtime tick.
+    racy_after_ns = previous["started_ns"] if previous else 0
+    if previous: print(f"[INFO] Incremental: {len(previous_files)} files in the previous snapshot.")
+    manifest_files = {}
+    sections = {}  # path -> [offset, length], for the index
+    seen = set()
+    first_seen = {}  # sha256 -> first path with those bytes, for dedup
+    writer = diff_writer = old_snapshot = new_snapshot = None
     try:
-        with open(output_file, "w", encoding=encoding) as md_file:
-            md_file.write("# Codebase Snapshot\n\n")
-            md_file.write(f"Source Directory: `{os.path.basename(abs_root)}`\n\n")
-            for dirpath, dirnames, filenames in os.walk(abs_root, topdown=True):
-                dirs_to_remove = set()
-                for d in dirnames:
-                    rel_dir_path = os.path.relpath(os.path.join(dirpath, d), abs_root)
-                    if is_ignored(rel_dir_path, all_ignore_patterns): dirs_to_remove.add(d)
-                if dirs_to_remove:
-                    ignored_items_count += len(dirs_to_remove)
-                    dirnames[:] = [d for d in dirnames if d not in dirs_to_remove]
-                filenames.sort()
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    relative_filepath = os.path.relpath(filepath, abs_root).replace("\\", "/")
-                    if is_ignored(relative_filepath, all_ignore_patterns):
-                        ignored_items_count += 1; continue
-                    processed_files_count += 1
-                    print(f"[PROCESS] Adding: {relative_filepath}")
-                    md_file.write(f"## {relative_filepath}\n\n")
-                    try:
+        writer = SnapshotWriter(tmp_output, encoding, compression)
+        if previous: old_snapshot = open(abs_output, "rb")
+        if diff_output:
+            diff_writer = SnapshotWriter(diff_output, encoding)
+            diff_writer.write("# Codebase Snapshot (changes)\n\n")
+            diff_writer.write(f"Source Directory: `{os.path.basename(abs_root)}`\n\n")
+            new_snapshot = open(tmp_output, "rb")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-read") as pool:
+            writer.write("# Codebase Snapshot\n\n")
+            writer.write(f"Source Directory: `{os.path.basename(abs_root)}`\n\n")
+            pending = deque()
+            in_flight = 0
+            files = iter_snapshot_files(abs_root, matcher, counts, skip_paths)
+            window = workers * PREFETCH_PER_WORKER
+            while True:
+                for relative_filepath, filepath in files:
+                    stat = None
+                    if incremental:
+                        try:
+                            stat = os.stat(filepath)
+                        except OSError:
+                            pass  # Reported when the prefetch fails to read it
+                    entry = previous_files.get(relative_filepath)
+                    if (entry is not None and stat is not None and entry[0] == stat.st_size
+                            and entry[1] == stat.st_mtime_ns and stat.st_mtime_ns < racy_after_ns):
+                        pending.append((relative_filepath, filepath, stat, entry, None))
+                    else:
+                        pending.append((relative_filepath, filepath, stat, entry,
+                                        pool.submit(prefetch_file, filepath, encoding, incremental or dedup,
+                                                    not writer.seekable or dedup)))
+                        in_flight += 1
+                    if in_flight >= window or len(pending) >= window * 64:
+                        break
+                if not pending:
+                    break
+                relative_filepath, filepath, stat, entry, future = pending.popleft()
+                counts["processed"] += 1
+                if previous_files: seen.add(relative_filepath)
+                if future is None:
+                    # Unchanged since the previous run: copy its section byte for byte.
+                    counts["reused"] += 1
+                    manifest_files[relative_filepath] = entry[:3] + [writer.offset, entry[4]]
+                    if write_index: sections[relative_filepath] = [writer.offset, entry[4]]
+                    writer.copy_from(old_snapshot, entry[3], entry[4])
+                    continue
+                in_flight -= 1
+                print(f"[PROCESS] Adding: {relative_filepath}")
+                section_start = writer.offset
+                writer.write(f"## {relative_filepath}\n\n")
+                try:
+                    kind, language, payload, sha = future.result()
+                    if dedup and kind in ("text", "stream") and sha is not None:
+                        original = first_seen.setdefault(sha, relative_filepath)
+                        if original != relative_filepath and (kind == "stream" or len(payload) >= DEDUP_MIN_CHARS):
+                            kind = "duplicate"
+                            counts["duplicates"] += 1
+                            writer.write(f"```{language}\n{DUPLICATE_MARKER} `{original}`\n```\n\n")
+                    if kind == "stream":
                         try:
-                             with open(filepath, "r", encoding=encoding) as f_content: content = f_content.read()
-                             language = guess_language(filepath)
-                             md_file.write(f"```{language}\n{content}\n```\n\n")
+                            sha = stream_file_block(writer, filepath, language, encoding, validated=sha is not None)
                         except UnicodeDecodeError:
-                             md_file.write("```\n**Note:** File appears to be binary or uses an incompatible encoding.\nContent not displayed.\n```\n\n")
-                             print(f"[WARN] Binary or non-{encoding} file skipped content: {relative_filepath}")
+                            kind = "binary"
                         except Exception as read_err:
-                             errors.append(f"Error reading file '{relative_filepath}': {read_err}")
-                             md_file.write(f"```\n**Error reading file:** {read_err}\n```\n\n")
-                             print(f"[ERROR] Could not read file: {relative_filepath} - {read_err}")
-                    except Exception as e:
-                        errors.append(f"Error processing file '{relative_filepath}': {e}")
-                        md_file.write(f"```\n**Error processing file:** {e}\n```\n\n")
-                        print(f"[ERROR] Processing failed for: {relative_filepath} - {e}")
+                            kind, payload = "error", read_err
+                    if kind == "text":
+                        writer.write(f"```{language}\n{payload}\n```\n\n")
+                    elif kind == "binary":
+                        writer.write("```\n**Note:** File appears to be binary or uses an incompatible encoding.\nContent not displayed.\n```\n\n")
+                        print(f"[WARN] Binary or non-{encoding} file skipped content: {relative_filepath}")
+                    elif kind == "error":
+                        errors.append(f"Error reading file '{relative_filepath}': {payload}")
+                        writer.write(f"```\n**Error reading file:** {payload}\n```\n\n")
+                        print(f"[ERROR] Could not read file: {relative_filepath} - {payload}")
+                except Exception as e:
+                    kind = "error"
+                    errors.append(f"Error processing file '{relative_filepath}': {e}")
+                    writer.write(f"```\n**Error processing file:** {e}\n```\n\n")
+                    print(f"[ERROR] Processing failed for: {relative_filepath} - {e}")
+                if write_index: sections[relative_filepath] = [section_start, writer.offset - section_start]
+                if not incremental:
+                    continue
+                if kind != "error" and stat is not None:  # Failed reads stay out of the manifest and are retried
+                    manifest_files[relative_filepath] = [stat.st_size, stat.st_mtime_ns, sha, section_start,
+                                                         writer.offset - section_start]
+                changed = entry is None or sha is None or entry[2] != sha
+                if changed:
+                    counts["changed"] += 1
+                    if diff_writer is not None:
+                        writer.flush()
+                        diff_writer.copy_from(new_snapshot, section_start, writer.offset - section_start)
+            deleted = sorted(set(previous_files) - seen)
+            counts["deleted"] = len(deleted)
+            if diff_writer is not None and deleted:
+                diff_writer.write("# Deleted Files\n\n")
+                diff_writer.write("".join(f"- `{path}`\n" for path in deleted))
+        snapshot_size = writer.offset
+        writer.close()
+        if diff_writer is not None: diff_writer.close()
+        if old_snapshot is not None: old_snapshot.close()
+        if new_snapshot is not None: new_snapshot.close()
+        os.replace(tmp_output, abs_output)
+        if incremental:
+            save_manifest(abs_output, abs_root, encoding, started_ns, manifest_files)
+        if write_index:
+            write_sidecar(index_path(abs_output), abs_output, {"version": INDEX_VERSION, "files": sections})
     except IOError as e:
         print(f"[ERROR] Failed to write snapshot file '{output_file}': {e}", file=sys.stderr)
-        return False, processed_files_count, ignored_items_count, [f"IOError writing snapshot: {e}"]
+        return False, counts["processed"], counts["ignored"], [f"IOError writing snapshot: {e}"]
     except Exception as e:
         print(f"[ERROR] An unexpected error occurred during snapshot generation: {e}", file=sys.stderr)
-        return False, processed_files_count, ignored_items_count, [f"Unexpected error: {e}"]
+        return False, counts["processed"], counts["ignored"], [f"Unexpected error: {e}"]
+    finally:
+        for handle in (writer, diff_writer, old_snapshot, new_snapshot):
+            if handle is not None:
+                try: handle.close()
+                except Exception: pass
+        if os.path.exists(tmp_output):
+            try: os.remove(tmp_output)
+            except OSError: pass
+    processed_files_count, ignored_items_count = counts["processed"], counts["ignored"]
     print("-" * 60)
     print(f"Snapshot creation finished.")
     print(f"  Processed: {processed_files_count} files")
+    if incremental:
+        print(f"  Reused:    {counts['reused']} unchanged files")
+        print(f"  Changed:   {counts['changed']} new or modified files")
+        print(f"  Deleted:   {counts['deleted']} files")
+    if dedup: print(f"  Duplicates: {counts['duplicates']} files stored as references")
+    if compression: print(f"  Size:      {os.path.getsize(abs_output)} bytes ({compression}, {snapshot_size} uncompressed)")
     print(f"  Ignored:   {ignored_items_count} items")
     if errors: print(f"  Errors:    {len(errors)}"); [print(f"    - {err}") for err in errors]
     print("-" * 60)
     return True, processed_files_count, ignored_items_count, errors
 
-def extract_codebase(md_file, output_dir, encoding=ENCODING):
-    created_files_count = 0; errors = []; file_write_attempts = 0
-    abs_output_dir = os.path.abspath(output_dir)
-    if not os.path.isfile(md_file):
-        print(f"[ERROR] Snapshot file not found: {md_file}", file=sys.stderr)
-        return False, 0, ["Snapshot file not found."]
-    print("-" * 60); print(f"Starting codebase extraction (Markdown -> Folder):"); print(f"  Snapshot: {md_file}"); print(f"  Output Directory: {abs_output_dir}"); print("-" * 60)
-    try:
-        os.makedirs(abs_output_dir, exist_ok=True); print(f"[INFO] Ensured output directory exists: {abs_output_dir}")
-    except OSError as e: print(f"[ERROR] Failed to create output directory '{abs_output_dir}': {e}", file=sys.stderr); return False, 0, [f"Failed to create output directory: {e}"]
-    try:
-        with open(md_file, "r", encoding=encoding) as f: lines = f.readlines()
-    except Exception as e: print(f"[ERROR] Failed to read snapshot file '{md_file}': {e}", file=sys.stderr); return False, 0, [f"Failed to read snapshot file: {e}"]
-    relative_filepath = None; in_code_block = False; code_lines = []; skip_block_content = False
+SKIP_MARKERS = ("**Note:", "**Error reading file:", "**Binary File:")
+# Lines the parser has to look at: headers, fences and markers (after stripping whitespace).
+# Everything else is plain content, so one regex match replaces strip() and several startswith().
+_STRUCTURAL_LINE = re.compile(r"\s*(?:## \s*\S|```|\*\*(?:Note:|Error reading file:|Binary File:|Duplicate of:))")
+
+def duplicate_target(line_stripped):
+    """The path a `**Duplicate of:**` line refers to."""
+    return line_stripped[len(DUPLICATE_MARKER):].strip().strip('`').strip('/').strip('\\')
+
+def iter_snapshot_sections(lines, errors, wanted=None):
+    """Parse snapshot lines as they stream in; yield (relative_filepath, code_lines, where, duplicate_of) per file to write.
+
+    `where` describes the position for error messages. For a dedup reference, code_lines is
+    None and duplicate_of names the earlier file with the same content. Sections whose path
+    fails `wanted` (if given) are passed over without collecting their lines.
+    """
+    relative_filepath = None; in_code_block = False; code_lines = []; skip_block_content = False; unwanted = False; duplicate_of = None
+    structural = _STRUCTURAL_LINE.match
     for line_num, line in enumerate(lines, 1):
+        if structural(line) is None:
+            if in_code_block and not unwanted and not skip_block_content: code_lines.append(line)
+            continue
         line_stripped = line.strip()
         if line_stripped.startswith("## "):
             if relative_filepath and code_lines and not skip_block_content:
-                file_write_attempts += 1
-                if write_code_to_file(abs_output_dir, relative_filepath, code_lines, encoding): created_files_count += 1
-                else: errors.append(f"Failed write: {relative_filepath} (ended near line {line_num})")
-            code_lines = []; relative_filepath = None; in_code_block = False; skip_block_content = False
+                yield relative_filepath, code_lines, f"(ended near line {line_num})", None
+            code_lines = []; relative_filepath = None; in_code_block = False; skip_block_content = False; unwanted = False; duplicate_of = None
             new_relative_filepath = line[3:].strip().strip('/').strip('\\')
             if not new_relative_filepath: errors.append(f"Warning: Found '##' header without a filepath on line {line_num}. Skipping.")
+            elif wanted is not None and not wanted(new_relative_filepath): unwanted = True
             else: relative_filepath = new_relative_filepath
+        elif unwanted:
+            continue
         elif line_stripped.startswith("```"):
             if in_code_block:
                 in_code_block = False
                 if relative_filepath and code_lines and not skip_block_content:
-                     file_write_attempts += 1
-                     if write_code_to_file(abs_output_dir, relative_filepath, code_lines, encoding): created_files_count += 1
-                     else: errors.append(f"Failed write: {relative_filepath} (block ended line {line_num})")
+                     yield relative_filepath, code_lines, f"(block ended line {line_num})", None
+                elif duplicate_of:
+                    if relative_filepath: yield relative_filepath, None, f"(block ended line {line_num})", duplicate_of
                 elif skip_block_content: pass
                 elif relative_filepath and not code_lines:
-                    file_write_attempts += 1; print(f"[WARN] Empty code block for {relative_filepath} on line {line_num}. Creating empty file.")
-                    if write_code_to_file(abs_output_dir, relative_filepath, [], encoding): created_files_count += 1
-                    else: errors.append(f"Failed write (empty): {relative_filepath}")
+                    print(f"[WARN] Empty code block for {relative_filepath} on line {line_num}. Creating empty file.")
+                    yield relative_filepath, [], "(empty)", None
                 elif not relative_filepath and code_lines: errors.append(f"Warning: Code block found ending on line {line_num} without a preceding '## filepath' header. Content ignored.")
-                code_lines = []; skip_block_content = False
-            else: in_code_block = True; code_lines = []; skip_block_content = False
+                code_lines = []; skip_block_content = False; duplicate_of = None
+            else: in_code_block = True; code_lines = []; skip_block_content = False; duplicate_of = None
         elif in_code_block:
-            if line_stripped.startswith("**Note:") or line_stripped.startswith("**Error reading file:") or line_stripped.startswith("**Binary File:"):
+            if not code_lines and not skip_block_content and line_stripped.startswith(DUPLICATE_MARKER):
+                duplicate_of = duplicate_target(line_stripped); skip_block_content = True
+            elif line_stripped.startswith(SKIP_MARKERS):
                  skip_block_content = True; print(f"[INFO] Skipping content block for {relative_filepath} due to marker: {line_stripped[:30]}...")
             if not skip_block_content: code_lines.append(line)
     if relative_filepath and code_lines and not skip_block_content:
-        file_write_attempts += 1
-        if write_code_to_file(abs_output_dir, relative_filepath, code_lines, encoding): created_files_count += 1
-        else: errors.append(f"Failed write (end of file): {relative_filepath}")
-    elif relative_filepath and skip_block_content: pass
+        yield relative_filepath, code_lines, "(end of file)", None
+
+def parse_indexed_section(data, encoding=ENCODING):
+    """(relative_filepath, code_lines, duplicate_of) for the bytes of one indexed section; code_lines
+    is None for a binary/error note, a dedup reference or a section without a code block."""
+    lines = new_text_decoder(encoding).decode(data, final=True).splitlines(keepends=True)
+    relative_filepath = lines[0][3:].strip().strip('/').strip('\\') if lines and lines[0].startswith("## ") else None
+    fences = [i for i, line in enumerate(lines) if line.strip().startswith("```")]
+    if not relative_filepath or len(fences) < 2:
+        return relative_filepath, None, None
+    code_lines = lines[fences[0] + 1:fences[-1]]
+    if code_lines and code_lines[0].strip().startswith(DUPLICATE_MARKER):
+        return relative_filepath, None, duplicate_target(code_lines[0].strip())
+    if code_lines and code_lines[0].strip().startswith(SKIP_MARKERS):
+        return relative_filepath, None, None
+    return relative_filepath, code_lines, None
+
+def iter_indexed_sections(md_file, index, wanted, errors, encoding=ENCODING):
+    """Yield (relative_filepath, code_lines, where, duplicate_of) for the selected sections, reading
+    only their byte ranges through mmap."""
+    with open(md_file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0: return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+            for path, (offset, length) in sorted(index.items(), key=lambda item: item[1][0]):
+                if not wanted(path): continue
+                relative_filepath, code_lines, duplicate_of = parse_indexed_section(snapshot[offset:offset + length], encoding)
+                if relative_filepath != path:
+                    errors.append(f"Warning: Index entry for '{path}' does not point at its section (byte {offset}). Skipping.")
+                elif code_lines is None and duplicate_of is None:
+                    print(f"[INFO] Skipping content block for {path}: no extractable content.")
+                else:
+                    yield path, code_lines, f"(bytes {offset}-{offset + length})", duplicate_of
+
+def copy_extracted_file(output_dir, source_filepath, relative_filepath, encoding=ENCODING):
+    """Write `relative_filepath` with the content already extracted to `source_filepath` (a dedup reference)."""
+    source = os.path.join(output_dir, os.path.normpath(source_filepath))
+    try:
+        with open(source, "r", encoding=encoding) as infile:
+            content = infile.read()
+    except OSError as e:
+        print(f"[WRITE] [ERROR] Cannot copy {source_filepath} to its duplicate {relative_filepath}: {e}")
+        return False
+    return write_code_to_file(output_dir, relative_filepath, [content], encoding)
+
+def extract_codebase(md_file, output_dir, encoding=ENCODING, only=None, workers=DEFAULT_WORKERS):
+    """Recreate files from a snapshot.
+
+    The snapshot (plain, or gzip/zstd compressed) is parsed as a stream and files are
+    written on a thread pool (a bounded number at a time; sections for the same path are
+    written in snapshot order). Dedup references are resolved by copying the earlier file
+    once it has been written. With `only` (gitignore-style globs), just the matching files
+    are extracted, and if the snapshot has an index sidecar (fm --index, or an --incremental
+    manifest) only their byte ranges are read, via mmap.
+    """
+    created_files_count = 0; errors = []; file_write_attempts = 0
+    abs_output_dir = os.path.abspath(output_dir)
+    if not os.path.isfile(md_file):
+        print(f"[ERROR] Snapshot file not found: {md_file}", file=sys.stderr)
+        return False, 0, ["Snapshot file not found."]
+    print("-" * 60); print(f"Starting codebase extraction (Markdown -> Folder):"); print(f"  Snapshot: {md_file}"); print(f"  Output Directory: {abs_output_dir}")
+    if only: print(f"  Only: {only}")
+    print("-" * 60)
+    try:
+        os.makedirs(abs_output_dir, exist_ok=True); print(f"[INFO] Ensured output directory exists: {abs_output_dir}")
+    except OSError as e: print(f"[ERROR] Failed to create output directory '{abs_output_dir}': {e}", file=sys.stderr); return False, 0, [f"Failed to create output directory: {e}"]
+    wanted = only_filter(only) if only else None
+    workers = max(1, workers)
+    try:
+        with open_snapshot_text(md_file, encoding) as f, \
+             ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract-write") as pool:
+            index = load_index(md_file) if only and detect_compression(md_file) is None else None
+            if index is not None:
+                print(f"[INFO] Using index: {len(index)} sections.")
+                sections = iter_indexed_sections(md_file, index, wanted, errors, encoding)
+            else:
+                sections = iter_snapshot_sections(f, errors, wanted)
+            pending = deque()
+            last_write = {}  # path -> its latest write still pending, so repeated sections land in order
+            extracted = set()  # paths written (or being written) in this run, for dedup references
+            unresolved = {}  # dedup target not selected by --only -> paths that are copies of it
+
+            def finish_oldest():
+                nonlocal created_files_count
+                relative_filepath, where, future = pending.popleft()
+                if last_write.get(relative_filepath) is future: del last_write[relative_filepath]
+                if future.result(): created_files_count += 1
+                else: errors.append(f"Failed write: {relative_filepath} {where}")
+
+            def submit(relative_filepath, where, write, *args):
+                nonlocal file_write_attempts
+                file_write_attempts += 1
+                previous_write = last_write.get(relative_filepath)
+                if previous_write is not None: previous_write.result()
+                future = pool.submit(write, abs_output_dir, *args, encoding)
+                last_write[relative_filepath] = future
+                extracted.add(relative_filepath)
+                pending.append((relative_filepath, where, future))
+                if len(pending) >= workers * PREFETCH_PER_WORKER: finish_oldest()
+
+            for relative_filepath, code_lines, where, duplicate_of in sections:
+                if duplicate_of is None:
+                    submit(relative_filepath, where, write_code_to_file, relative_filepath, code_lines)
+                elif duplicate_of in extracted:
+                    source_write = last_write.get(duplicate_of)
+                    if source_write is not None: source_write.result()
+                    submit(relative_filepath, where, copy_extracted_file, duplicate_of, relative_filepath)
+                else:
+                    unresolved.setdefault(duplicate_of, []).append(relative_filepath)
+            if unresolved:
+                # --only picked copies of files it did not pick: read those originals in a second pass.
+                print(f"[INFO] Reading {len(unresolved)} more sections for duplicates of unselected files.")
+                with open_snapshot_text(md_file, encoding) as again:
+                    originals = iter_indexed_sections(md_file, index, unresolved.__contains__, errors, encoding) \
+                        if index is not None else iter_snapshot_sections(again, errors, unresolved.__contains__)
+                    for original, code_lines, where, _ in originals:
+                        for relative_filepath in unresolved.pop(original, ()):
+                            if code_lines is not None: submit(relative_filepath, where, write_code_to_file, relative_filepath, code_lines)
+                for original, copies in unresolved.items():
+                    errors.append(f"Warning: {len(copies)} file(s) reference '{original}', which is not in the snapshot: {copies}")
+            while pending: finish_oldest()
+    except Exception as e: print(f"[ERROR] Failed to read snapshot file '{md_file}': {e}", file=sys.stderr); return False, created_files_count, [f"Failed to read snapshot file: {e}"]
     print("-" * 60); print(f"Codebase extraction finished."); print(f"  Attempted writes: {file_write_attempts}"); print(f"  Successfully created: {created_files_count} files")
     if errors: print(f"  Errors/Warnings: {len(errors)}"); [print(f"    - {err}") for err in errors]
     print("-" * 60)
@@ -253,7 +1014,14 @@ def main():
     # Optional argument for output file
     parser_fm.add_argument('--output', '-o', required=True, dest='output_markdown', help='Path for the output Markdown snapshot file.')
     # Optional ignore patterns (remains the same)
-    parser_fm.add_argument('--ignore', action='append', default=[], help='Additional ignore patterns (glob style). Can be used multiple times.')
+    parser_fm.add_argument('--ignore', action='append', default=[], help='Additional ignore patterns (gitignore style). Can be used multiple times.')
+    parser_fm.add_argument('--no-gitignore', action='store_false', dest='use_gitignore', help='Do not read .gitignore files found in the source tree.')
+    parser_fm.add_argument('--incremental', '-i', action='store_true', help=f'Reuse unchanged sections of the previous snapshot, tracked in <output>{MANIFEST_SUFFIX}.')
+    parser_fm.add_argument('--index', action='store_true', dest='write_index', help=f'Write <output>{INDEX_SUFFIX} with the byte range of every file, for fast mf --only.')
+    parser_fm.add_argument('--diff-output', metavar='FILE', help='Also write a snapshot of only the files added or changed since the previous run (implies --incremental).')
+    parser_fm.add_argument('--workers', '-j', type=int, default=DEFAULT_WORKERS, help=f'Threads reading files ahead of the writer (default: {DEFAULT_WORKERS}).')
+    parser_fm.add_argument('--compress', choices=['auto', 'gzip', 'zstd', 'none'], default='auto', help='Compress the snapshot while writing it (default: auto, by a .gz/.zst output suffix; zstd needs the zstandard package).')
+    parser_fm.add_argument('--dedup', action='store_true', help=f'Store files whose content repeats an earlier file (at least {DEDUP_MIN_CHARS} characters) as a reference to it.')
 
     # --- Sub-parser for mf (Markdown to Folder) ---
     parser_mf = subparsers.add_parser('mf', help='Create Folder from Markdown.')
@@ -261,6 +1029,8 @@ def main():
     parser_mf.add_argument('input_markdown', help='Path to the input Markdown snapshot file.')
     # Optional argument for output directory
     parser_mf.add_argument('--output', '-o', required=True, dest='output_directory', help='Path to the directory where the codebase will be recreated.')
+    parser_mf.add_argument('--only', action='append', metavar='GLOB', help='Extract only files matching this gitignore-style pattern. Can be used multiple times.')
+    parser_mf.add_argument('--workers', '-j', type=int, default=DEFAULT_WORKERS, help=f'Threads writing files (default: {DEFAULT_WORKERS}).')
 
     args = parser.parse_args()
 
@@ -272,7 +1042,14 @@ def main():
             output_file=args.output_markdown,    # Use '-o' arg (renamed via dest)
             encoding=ENCODING,
             base_ignore_patterns=DEFAULT_IGNORE_PATTERNS,
-            user_ignore_patterns=args.ignore
+            user_ignore_patterns=args.ignore,
+            workers=args.workers,
+            use_gitignore=args.use_gitignore,
+            incremental=args.incremental,
+            diff_output=args.diff_output,
+            write_index=args.write_index,
+            compression=args.compress,
+            dedup=args.dedup
         )
         if success:
             print(f"\nSuccess! Snapshot created at: {args.output_markdown}")
@@ -288,7 +1065,9 @@ def main():
         success, created_count, errors = extract_codebase(
             md_file=args.input_markdown,       # Use positional arg
             output_dir=args.output_directory,  # Use '-o' arg (renamed via dest)
-            encoding=ENCODING
+            encoding=ENCODING,
+            only=args.only,
+            workers=args.workers
         )
         if success:
              print(f"\nSuccess! Codebase extracted to: {args.output_directory}")
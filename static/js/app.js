@@ -5,6 +5,14 @@ document.addEventListener('DOMContentLoaded', () => { // Ensure DOM is loaded be
     const sendButton = document.getElementById('sendButton');
     const messagesDiv = document.getElementById('messages');
     let websocket;
+    // Reconnect with exponential backoff and jitter, and never sooner than a server's retry_after,
+    // so a restart or overload does not turn every open tab into a reconnect storm.
+    const RECONNECT_BASE_MS = 1000;
+    const RECONNECT_MAX_MS = 30000;
+    const STABLE_CONNECTION_MS = 10000; // A connection that lasted this long resets the backoff
+    let reconnectDelay = RECONNECT_BASE_MS;
+    let retryAfterMs = 0;
+    let connectedAt = 0;
 
     function connectWebSocket() {
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
@@ -17,6 +25,7 @@ document.addEventListener('DOMContentLoaded', () => { // Ensure DOM is loaded be
         websocket = new WebSocket(wsUrl);
 
         websocket.onopen = () => {
+            connectedAt = Date.now();
             addMessageToDisplay('status', 'Connected to Calculon\'s relay.');
             console.log('WebSocket connected');
             messageInput.disabled = false;
@@ -58,9 +67,18 @@ document.addEventListener('DOMContentLoaded', () => { // Ensure DOM is loaded be
                     messageInput.focus();
                     break;
                 case 'error':
+                    if (data.details && data.details.retry_after) {
+                        retryAfterMs = data.details.retry_after * 1000;
+                        addMessageToDisplay('error', `Error from server: ${data.content} (retry in ${data.details.retry_after}s)`, true);
+                        currentAiMessageElement = null;
+                        break;
+                    }
                     addMessageToDisplay('error', `Error from server: ${data.content}`, true);
                     currentAiMessageElement = null;
                     break;
+                case 'pong':
+                    // Heartbeat reply; the socket being open is all it tells us
+                    break;
                 default:
                     console.warn('Unknown message type received:', data.type, data);
             }
@@ -72,12 +90,18 @@ document.addEventListener('DOMContentLoaded', () => { // Ensure DOM is loaded be
             if (event.reason) reason += `Reason: ${event.reason} `;
             if (event.wasClean) reason += `(Clean close) `; else reason += `(Unclean close) `;
             
-            addMessageToDisplay('status', `Disconnected. ${reason}Attempting to reconnect...`, true);
-            console.log(`WebSocket disconnected. ${reason}Attempting to reconnect...`);
+            if (connectedAt && Date.now() - connectedAt >= STABLE_CONNECTION_MS) reconnectDelay = RECONNECT_BASE_MS;
+            connectedAt = 0;
+            const delay = Math.max(retryAfterMs, reconnectDelay * (0.5 + Math.random() / 2));
+            reconnectDelay = Math.min(reconnectDelay * 2, RECONNECT_MAX_MS);
+            retryAfterMs = 0;
+
+            addMessageToDisplay('status', `Disconnected. ${reason}Reconnecting in ${Math.round(delay / 1000)}s...`, true);
+            console.log(`WebSocket disconnected. ${reason}Reconnecting in ${Math.round(delay)} ms...`);
             messageInput.disabled = true;
             sendButton.disabled = true;
             currentAiMessageElement = null;
-            setTimeout(connectWebSocket, 3000); // Try to reconnect after 3 seconds
+            setTimeout(connectWebSocket, delay);
         };
 
         websocket.onerror = (error) => {